@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ComcolBackendConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'comcol_backend'
+
+    def ready(self):
+        # Connect the signal receivers
+        from . import db, signals  # noqa: F401
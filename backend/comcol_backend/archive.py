@@ -0,0 +1,51 @@
+"""
+Layout of the collection archives written by ``export_collection`` and read
+by ``import_collection``: a tar stream whose members come in this order:
+
+- ``collection.json``: format version and row counts
+- ``computers/<n>.ndjson``: the computers, one JSON object per line
+- ``pictures/<n>.ndjson``: a batch of pictures, each followed by the
+  ``media/<name>`` files (original and variants) of the pictures in it;
+  the files of a content-addressed original are only written once
+
+Rows and files are read and written one batch at a time, so neither side
+holds the whole collection in memory.
+"""
+import os
+from .models import Computer, Picture
+
+FORMAT = 1
+HEADER = 'collection.json'
+COMPUTERS_DIR = 'computers'
+PICTURES_DIR = 'pictures'
+MEDIA_DIR = 'media'
+
+def row_fields(model, exclude=()):
+    # attname, so that foreign keys are exported as plain ids (computer_id)
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in exclude]
+
+COMPUTER_FIELDS = row_fields(Computer)
+# The blob of a content-addressed picture follows from its image name
+PICTURE_FIELDS = row_fields(Picture, exclude=['blob_id'])
+
+def batch_name(directory, index):
+    return f'{directory}/{index:06d}.ndjson'
+
+def picture_files(row):
+    """
+    Names, relative to MEDIA_ROOT, of the files of a picture row.
+    """
+    if not row['image']:
+        return []
+    return [row['image'], *row['variants'].values()]
+
+def media_path(media_root, name):
+    """
+    Absolute path of a media file named in an archive, or None when the name
+    would point outside ``media_root``.
+    """
+    root = os.path.abspath(media_root)
+    path = os.path.abspath(os.path.join(root, name))
+    if os.path.isabs(name) or not path.startswith(root + os.sep):
+        return None
+    return path
@@ -0,0 +1,171 @@
+"""
+Async versions of the read endpoints and of the picture upload, routed in
+place of the DRF views when COMCOL_ASGI is set (see entrypoint-asgi.sh).
+
+DRF views are synchronous: under an ASGI server Django runs them one at a
+time in a single thread per worker. The computer list, detail and search
+and the settings are therefore answered here with the async ORM, using the
+same fast path and producing the same bytes as the DRF views. Requests
+these views do not handle (writes, pagination, other renderers) are passed
+on to the DRF views unchanged.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from .conditional import async_conditional_collection
+from .filters import COLLECTION_FILTER_PARAMS, CollectionFilter, FullTextSearchFilter
+from .models import Computer, Picture
+from .response_cache import async_cache_response
+from .serializers import (
+    ComputerSerializer, first_picture_variants, parse_field_selection, picture_list_rows, serialize_computer_list,
+)
+from . import views
+
+computer_list_view = views.ComputerViewSet.as_view({'get': 'list', 'post': 'create'})
+computer_detail_view = views.ComputerViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+)
+upload_picture_view = views.PictureUploadView.as_view()
+upload_pictures_view = views.BatchPictureUploadView.as_view()
+
+_image_executor = None
+
+def image_executor():
+    """
+    The thread pool running the uploads, COMCOL_IMAGE_EXECUTOR_WORKERS
+    threads per worker process. Image decoding is further bounded by the
+    upload memory budget.
+    """
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'COMCOL_IMAGE_EXECUTOR_WORKERS', 4),
+            thread_name_prefix='comcol-image',
+        )
+    return _image_executor
+
+def call_with_connections(func, *args, **kwargs):
+    # The executor threads live across requests: handle their database
+    # connections like Django does around a request
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+class UseSyncView(Exception):
+    """Raised by an async view to have the DRF view answer the request."""
+
+def handles_json_get(sync_view, params=()):
+    """
+    Lets the async view answer GET requests for JSON that only use the
+    query parameters in ``params``, and passes every other request to the
+    DRF view ``sync_view``, as well as those the async view gives up on by
+    raising UseSyncView.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            accept = request.META.get('HTTP_ACCEPT', '*/*')
+            if (request.method != 'GET' or 'text/html' in accept or not request.accepts('application/json')
+                    or any(name not in params for name in request.GET)):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            try:
+                return await view_func(request, *args, **kwargs)
+            except UseSyncView:
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+        # The DRF views do their own CSRF checks
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+def json_response(data, status=200):
+    # Rendered like DRF's JSONRenderer, so that both kinds of views share
+    # the response cache and the ETags
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+def filter_collection(request, queryset):
+    # Only builds the query; invalid values are left to the DRF view's 400
+    try:
+        return CollectionFilter().filter_queryset(Request(request), queryset, views.ComputerViewSet)
+    except ValidationError:
+        raise UseSyncView()
+
+def field_selection(request):
+    # Unknown fields are left to the DRF view's 400
+    try:
+        return parse_field_selection(request.GET) or set(ComputerSerializer.Meta.default_fields)
+    except ValidationError:
+        raise UseSyncView()
+
+def search(request, queryset):
+    # Synchronous: the FTS5 check may introspect the database
+    return FullTextSearchFilter().filter_queryset(Request(request), queryset, views.ComputerViewSet)
+
+def computer_rows(queryset, selection):
+    if 'thumb' in selection:
+        queryset = queryset.annotate(first_variants=first_picture_variants())
+    columns = [field.name for field in Computer._meta.concrete_fields if field.name in selection]
+    return queryset.values('id', *columns, *(['first_variants'] if 'thumb' in selection else []))
+
+async def picture_rows(computers, selection):
+    if 'pictures' not in selection:
+        return []
+    pictures = Picture.objects.filter(computer_id__in=computers.values('id'))
+    return [row async for row in picture_list_rows(pictures)]
+
+@handles_json_get(computer_list_view, params=('search', 'fields', 'expand', *COLLECTION_FILTER_PARAMS))
+@async_conditional_collection
+@async_cache_response
+async def computer_list(request):
+    selection = field_selection(request)
+    queryset = filter_collection(request, Computer.objects.all())
+    if 'search' in request.GET:
+        queryset = await sync_to_async(search)(request, queryset)
+    rows = [row async for row in computer_rows(queryset, selection)]
+    pictures = await picture_rows(queryset, selection)
+    return json_response(serialize_computer_list(rows, selection, pictures))
+
+@handles_json_get(computer_detail_view, params=('fields', 'expand'))
+@async_conditional_collection
+@async_cache_response
+async def computer_detail(request, pk):
+    selection = field_selection(request)
+    queryset = Computer.objects.filter(pk=pk)
+    rows = [row async for row in computer_rows(queryset, selection)]
+    if not rows:
+        # Let DRF answer with its 404
+        raise UseSyncView()
+    pictures = await picture_rows(queryset, selection)
+    return json_response(serialize_computer_list(rows, selection, pictures)[0])
+
+@handles_json_get(views.settings)
+@async_conditional_collection
+async def settings_view(request):
+    return json_response(views.settings_data())
+
+async def upload_picture(request):
+    """
+    Runs the DRF upload view in the image executor, so that parsing the
+    multipart body, converting HEIC images and saving the picture happen
+    off the event loop and outside the thread shared by the sync views.
+    """
+    return await sync_to_async(call_with_connections, thread_sensitive=False, executor=image_executor())(
+        upload_picture_view, request
+    )
+upload_picture.csrf_exempt = True
+
+async def upload_pictures(request):
+    """
+    Runs the DRF batch upload view in the image executor, like upload_picture.
+    """
+    return await sync_to_async(call_with_connections, thread_sensitive=False, executor=image_executor())(
+        upload_pictures_view, request
+    )
+upload_pictures.csrf_exempt = True
@@ -0,0 +1,185 @@
+"""
+Content-addressed storage of the picture originals.
+
+An upload is stored as ``computer_pictures/<sha256>.jpeg``, named after the
+SHA-256 of the uploaded bytes (computed while they are received, see
+uploads.HashingUploadHandlerMixin). Uploading the same photo again reuses
+the stored original and, once they exist, its variants and metadata, so
+nothing is converted, decoded or resized twice. Files under such a name
+never change, which lets nginx serve them as immutable.
+
+Each stored original has an ImageBlob row counting the pictures that use
+it. The files are deleted after the last of them is, with the row.
+"""
+import logging
+import os
+import re
+import uuid
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .image_pipeline import get_variant_sizes, variant_path
+from .models import ImageBlob, Picture
+
+logger = logging.getLogger(__name__)
+
+PICTURES_DIR = 'computer_pictures'
+BLOB_NAME = re.compile(rf'^{PICTURES_DIR}/([0-9a-f]{{64}})\.jpeg$')
+
+# Copied from a picture of the same blob whose variants are ready
+REUSED_FIELDS = ('variants_status', 'variants', 'width', 'height', 'dominant_color', 'placeholder')
+
+def blob_name(sha256):
+    return f'{PICTURES_DIR}/{sha256}.jpeg'
+
+def blob_sha256(name):
+    """
+    The SHA-256 of a content-addressed picture file name, None for other names.
+    """
+    match = BLOB_NAME.match(name or '')
+    return match.group(1) if match else None
+
+def get_storage():
+    return Picture._meta.get_field('image').storage
+
+def store_blob(sha256, content):
+    """
+    Stores ``content`` as the original of ``sha256`` unless it already is.
+    Returns whether it was written. Call it holding a reference to the blob
+    (acquire_blob), so that the original cannot be deleted after the check.
+
+    The file is saved under a temporary name and renamed into place, so a
+    partially written original is never visible. Concurrent uploads of the
+    same content write the same bytes, whichever rename comes last wins.
+    """
+    storage = get_storage()
+    name = blob_name(sha256)
+    if storage.exists(name):
+        return False
+    temporary = storage.save(f'{PICTURES_DIR}/{sha256}.{uuid.uuid4().hex}.upload', content)
+    os.replace(storage.path(temporary), storage.path(name))
+    return True
+
+def acquire_blob(sha256, count=1):
+    """
+    Adds ``count`` references to the blob of ``sha256``, creating its row
+    if needed.
+    """
+    return acquire_blobs({sha256: count})[sha256]
+
+def acquire_blobs(references):
+    """
+    acquire_blob for many blobs, ``references`` mapping each SHA-256 to its
+    number of new references, in a few queries. Returns ``{sha256: blob}``.
+
+    Uploads take their references before storing the originals: once the
+    transaction has written the rows, delete_unused_blob() of the same
+    blobs either has finished, and the files are stored again, or waits and
+    then finds them in use.
+    """
+    with transaction.atomic():
+        ImageBlob.objects.bulk_create([ImageBlob(sha256=sha256) for sha256 in references], ignore_conflicts=True)
+        by_count = {}
+        for sha256, count in references.items():
+            by_count.setdefault(count, []).append(sha256)
+        now = timezone.now()
+        for count, hashes in by_count.items():
+            ImageBlob.objects.filter(sha256__in=hashes).update(refcount=F('refcount') + count, acquired_at=now)
+        return {blob.sha256: blob for blob in ImageBlob.objects.filter(sha256__in=list(references))}
+
+def ready_fields(blob):
+    """
+    The REUSED_FIELDS of a picture of ``blob`` whose variants are ready, or
+    None when there is none yet.
+    """
+    return (
+        Picture.objects.filter(blob=blob, variants_status=Picture.VARIANTS_READY)
+        .values(*REUSED_FIELDS)
+        .first()
+    )
+
+def ready_fields_by_blob(blobs):
+    """
+    ready_fields for many blobs in one query, as ``{blob id: fields}`` with
+    only the blobs that have a picture whose variants are ready.
+    """
+    ready = {}
+    rows = Picture.objects.filter(blob__in=blobs, variants_status=Picture.VARIANTS_READY).values('blob_id', *REUSED_FIELDS)
+    for row in rows:
+        ready.setdefault(row.pop('blob_id'), row)
+    return ready
+
+def release_blob(picture):
+    """
+    Drops the reference of a deleted ``picture`` to its blob. After the last
+    one, the blob and its files are deleted once the transaction has
+    committed.
+    """
+    drop_references(ImageBlob.objects.filter(pk=picture.blob_id), 1, picture.variants.values())
+
+def release_blobs(references):
+    """
+    Drops references taken with acquire_blobs() for pictures that were not
+    created in the end, ``references`` as for acquire_blobs().
+    """
+    for sha256, count in references.items():
+        drop_references(ImageBlob.objects.filter(sha256=sha256), count)
+
+def drop_references(blobs, count, variants=()):
+    blobs.filter(refcount__gte=count).update(refcount=F('refcount') - count)
+    sha256 = blobs.filter(refcount=0, pictures=None).values_list('sha256', flat=True).first()
+    if sha256 is None:
+        return
+    name = blob_name(sha256)
+    names = {name, *variants}
+    names.update(variant_path(name, suffix) for _, suffix in get_variant_sizes())
+    transaction.on_commit(lambda: delete_unused_blob(sha256, names))
+
+def delete_unused_blob(sha256, names):
+    """
+    Deletes the blob of ``sha256`` and its files ``names`` if it is still
+    unused. The row stays until then, and goes in the same transaction as
+    the files: an upload of the same content taking a reference meanwhile
+    keeps both (see acquire_blobs).
+    """
+    with transaction.atomic():
+        # Takes the write lock (the row lock on other databases) first
+        if not ImageBlob.objects.filter(sha256=sha256, refcount=0).update(refcount=0):
+            return
+        # pictures=None: never fails on PROTECT, even if the count drifted
+        if not ImageBlob.objects.filter(sha256=sha256, pictures=None).delete()[0]:
+            return
+        storage = get_storage()
+        for name in names:
+            try:
+                storage.delete(name)
+            except OSError as e:
+                logger.error("Failed to delete %s of blob %s: %s", name, sha256, e)
+
+def recount_blobs(dry_run=False, min_age=3600):
+    """
+    Sets every refcount back to the number of pictures using the blob and
+    deletes the blobs no picture uses, in case they drifted (e.g. rows
+    deleted with raw SQL). Their files are left to clean_media. Returns the
+    number of blobs fixed and deleted.
+
+    Blobs acquired less than ``min_age`` seconds ago are skipped: an upload
+    holds a reference before it creates its picture (see store_upload).
+    """
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    pictures = (
+        Picture.objects.filter(blob=OuterRef('pk')).order_by().values('blob')
+        .annotate(count=Count('id')).values('count')
+    )
+    actual = Coalesce(Subquery(pictures), 0)
+    settled = ImageBlob.objects.filter(acquired_at__lt=cutoff)
+    drifted = settled.annotate(actual=actual).exclude(refcount=F('actual'))
+    unused = settled.filter(pictures=None)
+    if dry_run:
+        return drifted.count(), unused.count()
+    with transaction.atomic():
+        fixed = ImageBlob.objects.filter(pk__in=drifted.values('pk')).update(refcount=actual)
+        deleted, _ = unused.delete()
+    return fixed, deleted
@@ -0,0 +1,80 @@
+import datetime
+import hashlib
+from functools import wraps
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+from .models import CollectionVersion
+from .response_cache import accepted_encoding
+
+def collection_state(request):
+    """
+    Returns the collection ``(version, updated_at)``, read once per request.
+    """
+    if not hasattr(request, '_collection_state'):
+        request._collection_state = CollectionVersion.current()
+    return request._collection_state
+
+def collection_etag(request, *args, **kwargs):
+    # The version changes with the data; the digest keeps representations
+    # that differ by query string, Accept header, content coding or write
+    # mode apart.
+    from .views import is_write_enabled
+    version, _ = collection_state(request)
+    key = '\n'.join([request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), str(accepted_encoding(request)),
+                     str(is_write_enabled())])
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def collection_last_modified(request, *args, **kwargs):
+    _, updated_at = collection_state(request)
+    return updated_at
+
+def conditional_collection(view_func):
+    """
+    Answers conditional GETs (If-None-Match / If-Modified-Since) with a 304
+    before the view runs, based on the collection version, and adds the
+    ETag and Last-Modified headers to full responses.
+
+    Use ``method_decorator(conditional_collection)`` on viewset methods.
+    """
+    conditional_view = condition(etag_func=collection_etag, last_modified_func=collection_last_modified)(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        # Browsers may keep the response but must revalidate it every time
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
+    return wrapper
+
+def async_conditional_collection(view_func):
+    """
+    conditional_collection for async views, which Django's condition()
+    decorator does not support. The collection state is read with the async
+    ORM; the 304 handling and the headers are the same.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not hasattr(request, '_collection_state'):
+            request._collection_state = await CollectionVersion.acurrent()
+        etag = collection_etag(request)
+        last_modified = collection_last_modified(request)
+        if last_modified is not None:
+            if not timezone.is_aware(last_modified):
+                last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+            last_modified = int(last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
+    return wrapper
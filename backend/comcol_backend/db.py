@@ -0,0 +1,29 @@
+import logging
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Pragmas that change the database file, not allowed on a read-only connection
+WRITE_PRAGMAS = {'journal_mode', 'synchronous'}
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Applies COMCOL_SQLITE_PRAGMAS to every new SQLite connection. With
+    CONN_MAX_AGE set this only runs once per worker process.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'COMCOL_SQLITE_PRAGMAS', {})
+    read_only = is_read_only(connection)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if read_only and name in WRITE_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+    logger.debug("SQLite connection opened%s with %s", " read-only" if read_only else "", pragmas)
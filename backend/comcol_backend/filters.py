@@ -0,0 +1,99 @@
+import re
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from .models import Picture
+
+FTS_TABLE = 'comcol_backend_computer_fts'
+
+# bm25 weights of the indexed columns: name, maker, description, favorite
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+_fts_available = {}
+
+def fts_available(alias):
+    """
+    Whether the FTS5 index created by migration 0011 exists on this database.
+    """
+    if alias not in _fts_available:
+        connection = connections[alias]
+        _fts_available[alias] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[alias]
+
+def build_match_query(terms):
+    """
+    Turns the search terms into an FTS5 query where every word is a quoted
+    prefix match, e.g. ``apple II`` becomes ``"apple"* "ii"*``. Quoting keeps
+    user input from being parsed as FTS5 syntax.
+    """
+    words = [word for term in terms for word in re.findall(r'\w+', term)]
+    return ' '.join(f'"{word}"*' for word in words)
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Ranked prefix search over name, maker, description and favorite using the
+    SQLite FTS5 index. Falls back to SearchFilter's icontains lookups on
+    ``search_fields`` when the index is not available.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        if not fts_available(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        match = build_match_query(terms)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # Both subqueries only touch the index: the first restricts the rows,
+        # the second ranks the matching ones (lower bm25 is better).
+        queryset = queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        )
+        rank = RawSQL(
+            f"SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+            (match,),
+        )
+        return queryset.annotate(search_rank=rank).order_by('search_rank', 'id')
+
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+
+# Query parameters handled by CollectionFilter
+COLLECTION_FILTER_PARAMS = ('year_min', 'year_max', 'maker', 'has_pictures')
+
+class CollectionFilter(BaseFilterBackend):
+    """
+    Filters the computers on the indexed columns:
+
+    - ``year_min`` / ``year_max``: inclusive year range
+    - ``maker``: exact maker name, repeatable to match any of several
+    - ``has_pictures``: ``1`` for computers with pictures, ``0`` without
+
+    Invalid values are answered with a 400.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        for param, lookup in (('year_min', 'year__gte'), ('year_max', 'year__lte')):
+            value = params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: 'Must be a year'})
+                queryset = queryset.filter(**{lookup: int(value)})
+        makers = [maker for maker in params.getlist('maker') if maker]
+        if makers:
+            queryset = queryset.filter(maker__in=makers)
+        has_pictures = params.get('has_pictures', '').lower()
+        if has_pictures:
+            if has_pictures not in TRUE_VALUES + FALSE_VALUES:
+                raise ValidationError({'has_pictures': 'Must be 1 or 0'})
+            pictures = Exists(Picture.objects.filter(computer_id=OuterRef('pk')))
+            queryset = queryset.filter(pictures if has_pictures in TRUE_VALUES else ~pictures)
+        return queryset
@@ -1,5 +1,12 @@
+import argparse
+import hashlib
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
 
 # Add the project root directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,9 +18,22 @@ import django
 # Initialize Django
 django.setup()
 
+from django.conf import settings
 from comcol_backend.models import Computer
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+INSTRUCTIONS = """
+Remember, I want:
+Please extract the year at which the computer was released. (YEAR=)
+Please extract the maker/brand of the computer. (BRAND=)
+Please extract the CPU/processor used in the computer. (CPU=)
+Please extract the frequency of the CPU of the computer (MHz=)
+Please extract the range of number of units made/sold (Units=)
+Skip lines for info you don't have/are not sure.
+Only use information from the provided text.
+All output must be in the form of: XXX="""
 
 def get_computer_name_and_url(computer_id):
     try:
@@ -22,42 +42,199 @@ def get_computer_name_and_url(computer_id):
     except Computer.DoesNotExist:
         return None, None
 
-def fetch_and_dump_content(url):
-    response = requests.get(url)
+class PageCache:
+    """
+    On-disk cache of fetched pages, keyed by URL. Each entry keeps the body
+    and the ETag/Last-Modified validators, so that a later run only needs a
+    conditional request to reuse it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.body"), os.path.join(self.directory, f"{key}.json")
+
+    def get(self, url):
+        body_path, meta_path = self.paths(url)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            with open(body_path, 'rb') as body_file:
+                return meta, body_file.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def write(self, path, data, mode):
+        # Write then rename, so that concurrent readers never see half a file
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, mode) as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def set(self, url, meta, body):
+        body_path, meta_path = self.paths(url)
+        self.write(body_path, body, 'wb')
+        self.write(meta_path, json.dumps(meta), 'w')
+
+    def touch(self, url, meta):
+        # The body is unchanged, only the time it was last validated is
+        meta['fetched_at'] = time.time()
+        self.write(self.paths(url)[1], json.dumps(meta), 'w')
+
+class TextExtractor(HTMLParser):
+    """
+    Collects the text of a page, like BeautifulSoup's get_text() but without
+    building a tree. Script, style and template contents are skipped.
+    """
+    SKIPPED_TAGS = {'script', 'style', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+def extract_text(html):
+    parser = TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return '\n'.join([line.strip() for line in ''.join(parser.parts).splitlines() if line.strip()])
+
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'comcol-gather/1.0'
+    return session
+
+def fetch_page(session, cache, url, max_age=0):
+    """
+    Returns the text of the page at ``url``, from the cache when it is
+    younger than ``max_age`` seconds or when the server answers 304 to a
+    conditional request.
+    """
+    meta, body = cache.get(url)
+    if meta is not None and time.time() - meta.get('fetched_at', 0) < max_age:
+        return body.decode(meta['encoding'], errors='replace')
+
+    headers = {}
+    if meta is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    response = session.get(url, headers=headers, timeout=30)
+    if response.status_code == 304 and meta is not None:
+        cache.touch(url, meta)
+        return body.decode(meta['encoding'], errors='replace')
     response.raise_for_status()
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    # print( soup.get_text() )
-    # print( "XXXX" )
-    print('\n'.join([line.strip() for line in soup.get_text().splitlines() if line.strip()]))
+    encoding = response.encoding or response.apparent_encoding or 'utf-8'
+    cache.set(url, {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'encoding': encoding,
+        'fetched_at': time.time(),
+    }, response.content)
+    return response.content.decode(encoding, errors='replace')
+
+def build_prompt(name, text):
+    return '\n'.join([
+        f"I am looking for information on a computer called :'{name}'",
+        "Please extract the year at which the computer was released.",
+        f"Here is the text dump of the wikipedia page about {name}:",
+        "-----------------------------------",
+        text,
+        "-----------------------------------",
+        INSTRUCTIONS,
+    ])
+
+def default_cache_dir():
+    return os.path.join(settings.BASE_DIR, 'cache', 'pages')
+
+def gather_batch(computers, workers, cache, max_age, output_dir=None):
+    """
+    Fetches the pages of ``computers`` (``(id, name, url)`` tuples) with a
+    bounded thread pool sharing one pooled session, and writes one prompt
+    per computer to ``output_dir`` or to stdout. Returns the number of
+    failures.
+    """
+    session = make_session(workers)
+
+    def gather_one(computer_id, name, url):
+        return build_prompt(name, extract_text(fetch_page(session, cache, url, max_age)))
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(gather_one, *computer): computer for computer in computers}
+        for future in as_completed(futures):
+            computer_id, name, url = futures[future]
+            try:
+                prompt = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"Failed to gather {name} ({computer_id}) from {url}: {e}", file=sys.stderr)
+                continue
+            if output_dir:
+                with open(os.path.join(output_dir, f"{computer_id}.txt"), 'w') as f:
+                    f.write(prompt + '\n')
+            else:
+                print(f"===== {computer_id}: {name} =====")
+                print(prompt)
+    return failures
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python gather.py <computer_id>")
+    parser = argparse.ArgumentParser(description="Dumps the web page of computers as a prompt to extract their specifications.")
+    parser.add_argument('computer_ids', nargs='*', type=int)
+    parser.add_argument('--all', action='store_true', help="Gather every computer that has a URL.")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent fetches in batch mode.")
+    parser.add_argument('--cache-dir', default=None, help="Directory of the page cache.")
+    parser.add_argument('--max-age', type=int, default=0,
+                        help="Reuse cached pages younger than this many seconds without revalidating them.")
+    parser.add_argument('--output-dir', default=None, help="Write one <id>.txt prompt per computer here.")
+    args = parser.parse_args()
+
+    if not args.computer_ids and not args.all:
+        parser.print_usage()
         sys.exit(1)
 
-    computer_id = int(sys.argv[1])
-    name, url = get_computer_name_and_url(computer_id)
+    cache = PageCache(args.cache_dir or default_cache_dir())
 
-    if not url:
-        print(f"No URL found for computer with ID {computer_id}")
-        sys.exit(1)
+    if len(args.computer_ids) == 1 and not args.all:
+        computer_id = args.computer_ids[0]
+        name, url = get_computer_name_and_url(computer_id)
 
-    print(f"I am looking for information on a computer called :'{name}'")
-    print( "Please extract the year at which the computer was released.")
+        if not url:
+            print(f"No URL found for computer with ID {computer_id}")
+            sys.exit(1)
 
-    print( f"Here is the text dump of the wikipedia page about {name}:")
-    print( "-----------------------------------")
-    fetch_and_dump_content(url)
-    print( "-----------------------------------")
-    print( """
-Remember, I want:
-Please extract the year at which the computer was released. (YEAR=)
-Please extract the maker/brand of the computer. (BRAND=)
-Please extract the CPU/processor used in the computer. (CPU=)
-Please extract the frequency of the CPU of the computer (MHz=)
-Please extract the range of number of units made/sold (Units=)
-Skip lines for info you don't have/are not sure.
-Only use information from the provided text.
-All output must be in the form of: XXX=""")
+        print(build_prompt(name, extract_text(fetch_page(make_session(1), cache, url, args.max_age))))
+        sys.exit(0)
 
+    computers = Computer.objects.exclude(url__isnull=True).exclude(url='')
+    if not args.all:
+        computers = computers.filter(id__in=args.computer_ids)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    failures = gather_batch(list(computers.values_list('id', 'name', 'url')), args.workers, cache, args.max_age, args.output_dir)
+    sys.exit(1 if failures else 0)
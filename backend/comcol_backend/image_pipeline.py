@@ -0,0 +1,221 @@
+import base64
+import hashlib
+import os
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Square variants generated for every picture, as (size in pixels, suffix).
+# Overridden by the COMCOL_PICTURE_VARIANTS setting.
+DEFAULT_VARIANT_SIZES = [
+    (100,  'thumb'),
+    (200, 'gallery'),
+    (300, 'portrait'),
+]
+
+def get_variant_sizes():
+    from django.conf import settings
+    return getattr(settings, 'COMCOL_PICTURE_VARIANTS', DEFAULT_VARIANT_SIZES)
+
+# Modes and formats of the pictures resized on demand (see resizing.py)
+RESIZE_FITS = ('cover', 'contain')
+RESIZE_FORMATS = {'jpeg': 'JPEG', 'webp': 'WEBP', 'png': 'PNG'}
+
+# Side in pixels of the inline placeholder image
+PLACEHOLDER_SIZE = 8
+
+def variant_path(original_path, suffix):
+    base = os.path.splitext(original_path)[0]
+    return f"{base}-{suffix}.jpeg"
+
+def open_square(path, min_size):
+    """
+    Opens an image and returns its centered square crop in RGB, decoded at
+    the smallest resolution that still covers ``min_size`` pixels, with the
+    ``(width, height)`` of the original.
+
+    For JPEGs, draft mode lets libjpeg decode directly at 1/2, 1/4 or 1/8
+    scale, so a 48 MP photo is never fully decoded to produce 300px variants.
+    """
+    image = Image.open(path)
+    original_size = image.size
+    if image.format == 'JPEG':
+        # Both sides stay >= min_size, so the square crop does as well
+        image.draft('RGB', (min_size, min_size))
+    width, height = image.size
+    min_dim = min(width, height)
+    left = (width - min_dim) // 2
+    top = (height - min_dim) // 2
+    square = image.crop((left, top, left + min_dim, top + min_dim))
+    if square.mode != 'RGB':
+        square = square.convert('RGB')
+    return square, original_size
+
+def open_for_resize(path, width, height):
+    """
+    Opens an image to be resized to fit a ``width`` x ``height`` box. Like
+    open_square, JPEGs are set to decode at the smallest scale still larger
+    than the box; ``image.size`` is that decoded size until load().
+    """
+    image = Image.open(path)
+    if image.format == 'JPEG':
+        # Square box: still large enough if the EXIF orientation swaps sides
+        side = max(width, height)
+        image.draft('RGB', (side, side))
+    return image
+
+def resize_to_box(image, width, height, fit):
+    """
+    Resizes an image opened with open_for_resize. ``cover`` returns exactly
+    ``width`` x ``height``, cropped around the centre; ``contain`` keeps the
+    whole image within the box and never enlarges it.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    if fit == 'cover':
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    image.thumbnail((width, height), Image.LANCZOS, reducing_gap=3.0)
+    return image
+
+def save_resized(image, path, fmt):
+    pil_format = RESIZE_FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(path, format=pil_format)
+
+def dominant_color(image):
+    """
+    Returns the most common colour of a small RGB image as ``#rrggbb``,
+    after reducing it to a few colours so that noise does not win.
+    """
+    quantized = image.quantize(colors=8)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def placeholder(image):
+    """
+    Returns a tiny PNG of the image as a data URI, shown blurred by the
+    frontend while the real variant loads.
+    """
+    tiny = image.resize((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BOX)
+    buffer = BytesIO()
+    tiny.save(buffer, format='PNG', optimize=True)
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def image_metadata(original_size, small_square):
+    """
+    Metadata stored on the picture: size of the original, and the dominant
+    colour and placeholder computed from a small square variant.
+    """
+    width, height = original_size
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': dominant_color(small_square),
+        'placeholder': placeholder(small_square),
+    }
+
+def process_picture(original_path, sizes=None):
+    """
+    Creates the square variant JPEGs next to the original and returns a
+    ``{suffix: path}`` mapping with the picture metadata (see
+    image_metadata).
+
+    The original is decoded once; each variant is then resized from the
+    previous, larger one, and the metadata comes from the smallest. Images
+    are never upscaled. This only touches the filesystem, so that it can
+    run in a worker process without Django.
+    """
+    sizes = sorted(sizes or DEFAULT_VARIANT_SIZES, reverse=True)
+    current, original_size = open_square(original_path, sizes[0][0])
+    written = {}
+    for size, suffix in sizes:
+        if current.width > size:
+            # reducing_gap lets Pillow shrink by an integer factor first,
+            # which matters for the first step from a non-JPEG original
+            current = current.resize((size, size), Image.LANCZOS, reducing_gap=3.0)
+        path = variant_path(original_path, suffix)
+        current.save(path, format='JPEG')
+        written[suffix] = path
+    return written, image_metadata(original_size, current)
+
+def read_metadata(original_path, small_variant_path=None, size=None):
+    """
+    Computes the image_metadata of an existing picture, from its smallest
+    variant when there is one, without writing anything. Without it, the
+    original is reduced to ``size``, the smallest variant size by default.
+    """
+    with Image.open(original_path) as original:
+        original_size = original.size
+    if small_variant_path and os.path.exists(small_variant_path):
+        with Image.open(small_variant_path) as variant:
+            small_square = variant.convert('RGB')
+    else:
+        size = size or min(get_variant_sizes())[0]
+        small_square, _ = open_square(original_path, size)
+        small_square = small_square.resize((size, size), Image.LANCZOS, reducing_gap=3.0)
+    return image_metadata(original_size, small_square)
+
+def generate_variants(original_path, sizes=None):
+    """
+    Same as process_picture, returning only the ``{suffix: path}`` mapping.
+    """
+    written, _ = process_picture(original_path, sizes)
+    return written
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def check_variants(original_path, sizes, original_size=None, decode=True):
+    """
+    Returns ``{suffix: problem}`` for the variants of an original that are
+    ``missing``, ``corrupt`` (do not decode) or ``stale`` (not the square
+    of the size they should have, e.g. after the sizes were changed). With
+    ``decode=False`` only their existence is checked.
+    """
+    problems = {}
+    for size, suffix in sizes:
+        path = variant_path(original_path, suffix)
+        if not os.path.exists(path):
+            problems[suffix] = 'missing'
+            continue
+        if not decode:
+            continue
+        try:
+            with Image.open(path) as variant:
+                variant.load()
+                width, height = variant.size
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            problems[suffix] = 'corrupt'
+            continue
+        # Originals smaller than the variant are not upscaled
+        expected = min(size, *original_size) if original_size else None
+        if width != height or (width != expected if expected else width > size):
+            problems[suffix] = 'stale'
+    return problems
+
+def repair_variants(original_path, sizes, original_size=None, decode=True, force=False, sha256=None, dry_run=False):
+    """
+    Checks the variants of an original (see check_variants) and, unless
+    ``dry_run``, generates them all again when any is wrong, or always with
+    ``force``. When ``sha256`` is given, the original is first checked
+    against it and never used if it does not match.
+
+    Returns ``(problems, written, metadata)``, the last two as returned by
+    process_picture or None when nothing was generated. Like process_picture,
+    it can run in a worker process without Django.
+    """
+    if not os.path.exists(original_path):
+        raise FileNotFoundError(f"Original {original_path} is missing")
+    if sha256 is not None and file_sha256(original_path) != sha256:
+        raise ValueError(f"Original does not match its checksum {sha256}")
+    problems = {} if force else check_variants(original_path, sizes, original_size, decode)
+    if dry_run or not (force or problems):
+        return problems, None, None
+    written, metadata = process_picture(original_path, sizes)
+    return problems, written, metadata
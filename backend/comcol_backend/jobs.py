@@ -0,0 +1,100 @@
+import logging
+import uuid
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .image_pipeline import variant_path
+from .models import DerivativeJob, Picture
+from .signals import collection_changed
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+def enqueue_derivatives(picture):
+    """
+    Marks the picture variants as pending and queues a job to generate them.
+    """
+    if picture.variants_status != Picture.VARIANTS_PENDING:
+        picture.variants_status = Picture.VARIANTS_PENDING
+        picture.save(update_fields=['variants_status'])
+    return DerivativeJob.objects.create(picture=picture)
+
+def bulk_enqueue_derivatives(pictures):
+    """
+    Queues a job for each of the newly created ``pictures`` whose variants
+    are pending, with one insert. Returns the number of jobs queued.
+    """
+    jobs = DerivativeJob.objects.bulk_create([
+        DerivativeJob(picture=picture) for picture in pictures
+        if picture.variants_status == Picture.VARIANTS_PENDING
+    ])
+    return len(jobs)
+
+def claim_jobs(limit, worker=None):
+    """
+    Atomically marks up to ``limit`` queued jobs as running for this worker
+    and returns them. Several workers can poll the same table safely: a job
+    is only returned to the worker whose tag was written on it.
+    """
+    worker = worker or uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(
+            DerivativeJob.objects.filter(status=DerivativeJob.QUEUED)
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        DerivativeJob.objects.filter(id__in=ids, status=DerivativeJob.QUEUED).update(
+            status=DerivativeJob.RUNNING, worker=worker, updated_at=timezone.now()
+        )
+    return list(
+        DerivativeJob.objects.filter(status=DerivativeJob.RUNNING, worker=worker)
+        .select_related('picture')
+        .order_by('id')
+    )
+
+def complete_job(job, suffixes, metadata=None):
+    """
+    Marks the job done and stores the manifest of the generated ``suffixes``
+    on the picture, with the ``metadata`` fields computed from the same
+    decode (see image_pipeline.image_metadata).
+    """
+    DerivativeJob.objects.filter(pk=job.pk).update(
+        status=DerivativeJob.DONE, attempts=job.attempts + 1, last_error='', updated_at=timezone.now()
+    )
+    name = job.picture.image.name
+    variants = {suffix: variant_path(name, suffix) for suffix in suffixes}
+    # A filtered update, as the picture may have been deleted meanwhile
+    Picture.objects.filter(pk=job.picture_id).update(
+        variants_status=Picture.VARIANTS_READY, variants=variants, **(metadata or {})
+    )
+    collection_changed.send(sender=Picture, computer_ids=[job.picture.computer_id])
+
+def fail_job(job, error):
+    """
+    Records a failed attempt. The job is queued again until it has used up
+    MAX_ATTEMPTS, after which the picture is flagged as failed.
+    """
+    attempts = job.attempts + 1
+    if attempts < MAX_ATTEMPTS:
+        status = DerivativeJob.QUEUED
+    else:
+        status = DerivativeJob.FAILED
+        Picture.objects.filter(pk=job.picture_id).update(variants_status=Picture.VARIANTS_FAILED)
+        collection_changed.send(sender=Picture, computer_ids=[job.picture.computer_id])
+    DerivativeJob.objects.filter(pk=job.pk).update(
+        status=status, attempts=attempts, worker='', last_error=str(error), updated_at=timezone.now()
+    )
+    logger.error("Derivative job %s for picture %s failed: %s", job.id, job.picture_id, error)
+
+def requeue_stale_jobs(older_than):
+    """
+    Puts back jobs left running by a worker that died, and returns how many
+    were requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return DerivativeJob.objects.filter(status=DerivativeJob.RUNNING, updated_at__lt=cutoff).update(
+        status=DerivativeJob.QUEUED, worker=''
+    )
@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from comcol_backend.image_pipeline import get_variant_sizes, read_metadata
+from comcol_backend.models import Picture
+from comcol_backend.signals import collection_changed
+
+METADATA_FIELDS = ['width', 'height', 'dominant_color', 'placeholder']
+
+class Command(BaseCommand):
+    help = "Computes the size, dominant colour and placeholder of pictures uploaded before they were stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute every picture, not only those without metadata.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        pictures = Picture.objects.exclude(image='').order_by('id')
+        if not options['all']:
+            pictures = pictures.filter(width__isnull=True)
+        # Passed to the children, which do not see settings given with --settings
+        smallest_size, smallest_suffix = min(get_variant_sizes())
+        total = pictures.count()
+        self.stdout.write(f"{total} picture(s) to process")
+
+        ids = list(pictures.values_list('id', flat=True))
+        done = failed = 0
+        # The children only decode images: spawn them so that they do not
+        # inherit the database connection of this process.
+        with ProcessPoolExecutor(max_workers=max(1, options['workers']),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            for start in range(0, len(ids), options['batch_size']):
+                batch = list(Picture.objects.filter(id__in=ids[start:start + options['batch_size']]))
+                futures = []
+                for picture in batch:
+                    variant = picture.variants.get(smallest_suffix)
+                    small_variant_path = picture.image.storage.path(variant) if variant else None
+                    futures.append(pool.submit(read_metadata, picture.image.path, small_variant_path, smallest_size))
+                updated = []
+                for picture, future in zip(batch, futures):
+                    try:
+                        metadata = future.result()
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"Picture {picture.id} ({picture.image.name}): {e}")
+                        continue
+                    for field, value in metadata.items():
+                        setattr(picture, field, value)
+                    updated.append(picture)
+                Picture.objects.bulk_update(updated, METADATA_FIELDS)
+                if updated:
+                    # bulk_update does not send post_save
+                    collection_changed.send(sender=Picture, computer_ids=sorted({p.computer_id for p in updated}))
+                done += len(updated)
+                self.stdout.write(f"{done + failed}/{total}")
+
+        self.stdout.write(f"Stored metadata of {done} picture(s), {failed} failed")
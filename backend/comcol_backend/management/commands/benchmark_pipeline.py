@@ -0,0 +1,95 @@
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from PIL import Image
+from comcol_backend.image_pipeline import generate_variants, get_variant_sizes
+from comcol_backend.upload_budget import peak_rss_mb
+
+def legacy_generate_variants(original_path, sizes):
+    # The per-size loop that the pipeline replaced, kept as a baseline
+    image = Image.open(original_path)
+    base = os.path.splitext(original_path)[0]
+    for size, suffix in sizes:
+        img_copy = image.copy().convert('RGB')
+        width, height = img_copy.size
+        min_dim = min(width, height)
+        left = (width - min_dim) // 2
+        top = (height - min_dim) // 2
+        img_copy = img_copy.crop((left, top, left + min_dim, top + min_dim))
+        img_copy.thumbnail((size, size), Image.LANCZOS)
+        img_copy.save(f"{base}-{suffix}.jpeg", format='JPEG')
+
+def measure(implementation, path, sizes, results):
+    # Runs in a freshly spawned process so that the peak is the one of this
+    # single run and not of whatever the parent allocated before.
+    function = legacy_generate_variants if implementation == 'legacy' else generate_variants
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    function(path, sizes)
+    elapsed = time.perf_counter() - start
+    results.put((elapsed, peak_rss_mb() - before))
+
+def make_sample(directory, megapixels):
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Noise compresses about as badly as a real photo
+    noise = Image.effect_noise((width, height), 64)
+    image = Image.merge('RGB', (noise, noise.transpose(Image.FLIP_LEFT_RIGHT), noise.transpose(Image.FLIP_TOP_BOTTOM)))
+    path = os.path.join(directory, f"sample-{megapixels}mp.jpeg")
+    image.save(path, format='JPEG', quality=90)
+    return path
+
+class Command(BaseCommand):
+    help = "Measures time and peak RSS of picture variant generation per upload."
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='*', help="Images to process (default: synthetic JPEGs).")
+        parser.add_argument('--megapixels', type=int, nargs='+', default=[12, 48],
+                            help="Sizes of the synthetic JPEGs when no image is given.")
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--legacy', action='store_true',
+                            help="Also measure the former decode-per-size loop for comparison.")
+        parser.add_argument('--json', action='store_true', help="Output results as JSON.")
+
+    def handle(self, *args, **options):
+        sizes = get_variant_sizes()
+        implementations = ['pipeline'] + (['legacy'] if options['legacy'] else [])
+        context = multiprocessing.get_context('spawn')
+        report = []
+        with tempfile.TemporaryDirectory() as workdir:
+            images = options['images'] or [make_sample(workdir, mp) for mp in options['megapixels']]
+            for source in images:
+                # Work on a copy so that the variants land in the temporary directory
+                path = os.path.join(workdir, 'bench-' + os.path.basename(source))
+                shutil.copyfile(source, path)
+                for implementation in implementations:
+                    timings, peaks = [], []
+                    for _ in range(options['runs']):
+                        results = context.Queue()
+                        process = context.Process(target=measure, args=(implementation, path, sizes, results))
+                        process.start()
+                        elapsed, peak = results.get()
+                        process.join()
+                        timings.append(elapsed)
+                        peaks.append(peak)
+                    report.append({
+                        'image': os.path.basename(source),
+                        'implementation': implementation,
+                        'runs': options['runs'],
+                        'median_seconds': round(statistics.median(timings), 4),
+                        'max_peak_rss_mb': round(max(peaks), 1),
+                    })
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for row in report:
+            self.stdout.write(
+                f"{row['image']:<30} {row['implementation']:<9} "
+                f"{row['median_seconds'] * 1000:8.1f} ms  {row['max_peak_rss_mb']:7.1f} MB peak RSS"
+            )
@@ -0,0 +1,118 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from comcol_backend.blobs import recount_blobs
+from comcol_backend.image_pipeline import get_variant_sizes, variant_path
+from comcol_backend.models import Picture
+
+PICTURES_DIR = 'computer_pictures'
+
+def referenced_files():
+    """
+    Returns the names, relative to MEDIA_ROOT, of every file a picture uses:
+    the original, the variants in its manifest and the variants the current
+    size table would generate (those of pending pictures do not exist yet).
+    """
+    suffixes = [suffix for _, suffix in get_variant_sizes()]
+    referenced = set()
+    for image, variants in Picture.objects.values_list('image', 'variants').iterator(chunk_size=2000):
+        if not image:
+            continue
+        referenced.add(image)
+        referenced.update(variants.values())
+        referenced.update(variant_path(image, suffix) for suffix in suffixes)
+    return referenced
+
+def walk_files(directory, root):
+    """
+    Yields ``(relative name, DirEntry)`` for the files under ``directory``
+    without building the listing in memory.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_files(entry.path, root)
+            elif entry.is_file(follow_symlinks=False):
+                yield os.path.relpath(entry.path, root).replace(os.sep, '/'), entry
+
+def delete_file(path):
+    try:
+        os.remove(path)
+        return None
+    except OSError as e:
+        return e
+
+class Command(BaseCommand):
+    help = ("Deletes media files under computer_pictures/ that no picture references (originals and variants), "
+            "after fixing the reference counts of the content-addressed originals.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only list the files that would be deleted.")
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help="Keep files modified, and blobs acquired, less than this many seconds ago "
+                                 "(uploads in flight).")
+        parser.add_argument('--workers', type=int, default=1, help="Delete with this many threads.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Files deleted per batch.")
+
+    def handle(self, *args, **options):
+        media_root = str(settings.MEDIA_ROOT)
+        pictures_dir = os.path.join(media_root, PICTURES_DIR)
+        if not os.path.isdir(pictures_dir):
+            self.stdout.write(f"No {pictures_dir} directory, nothing to do")
+            return
+
+        # Blobs first, so that the files of unused ones are deleted below
+        fixed, unused = recount_blobs(dry_run=options['dry_run'], min_age=options['min_age'])
+        if fixed or unused:
+            verb = "would be" if options['dry_run'] else "were"
+            self.stdout.write(f"Blobs: {fixed} refcount(s) {verb} fixed, {unused} unused blob(s) {verb} deleted")
+        referenced = referenced_files()
+        self.stdout.write(f"{len(referenced)} referenced file(s)")
+
+        cutoff = time.time() - options['min_age']
+        executor = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        scanned = deleted = failed = kept_recent = 0
+        batch = []
+
+        def flush(batch):
+            nonlocal deleted, failed
+            if options['dry_run']:
+                for name, _ in batch:
+                    self.stdout.write(f"Would delete: {name}")
+                deleted += len(batch)
+                return
+            paths = [path for _, path in batch]
+            errors = executor.map(delete_file, paths) if executor else map(delete_file, paths)
+            for (name, _), error in zip(batch, errors):
+                if error is None:
+                    deleted += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Deleted: {name}")
+                else:
+                    failed += 1
+                    self.stderr.write(f"Failed to delete {name}: {error}")
+
+        try:
+            for name, entry in walk_files(pictures_dir, media_root):
+                scanned += 1
+                if name in referenced:
+                    continue
+                if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    kept_recent += 1
+                    continue
+                batch.append((name, entry.path))
+                if len(batch) >= options['batch_size']:
+                    flush(batch)
+                    batch = []
+            flush(batch)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        action = "would be deleted" if options['dry_run'] else "deleted"
+        self.stdout.write(
+            f"Scanned {scanned} file(s): {deleted} {action}, {failed} failed, "
+            f"{kept_recent} unreferenced but too recent"
+        )
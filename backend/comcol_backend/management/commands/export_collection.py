@@ -0,0 +1,90 @@
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from itertools import islice
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from comcol_backend.archive import (
+    COMPUTER_FIELDS, COMPUTERS_DIR, FORMAT, HEADER, MEDIA_DIR, PICTURE_FIELDS, PICTURES_DIR, batch_name,
+    media_path, picture_files,
+)
+from comcol_backend.blobs import blob_sha256
+from comcol_backend.models import Computer, Picture
+
+def batches(rows, size):
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def add_bytes(archive, name, data, mtime):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    archive.addfile(info, io.BytesIO(data))
+
+def ndjson(rows):
+    return b''.join(json.dumps(row, separators=(',', ':'), ensure_ascii=False).encode() + b'\n' for row in rows)
+
+class Command(BaseCommand):
+    help = ("Writes the whole collection (computers, pictures and their media files) as a tar stream that "
+            "import_collection loads into another instance.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Archive file to write, or - for the standard output.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the stream (the pictures are already JPEGs).")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows per NDJSON member.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        mode = 'w|gz' if options['gzip'] else 'w|'
+        to_stdout = options['output'] == '-'
+        # Progress goes to stderr when the archive is written to stdout
+        log = self.stderr if to_stdout else self.stdout
+        output = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        media_root = str(settings.MEDIA_ROOT)
+        mtime = int(time.time())
+        missing = files = 0
+        try:
+            with tarfile.open(fileobj=output, mode=mode) as archive:
+                computer_count = Computer.objects.count()
+                picture_count = Picture.objects.count()
+                header = {'format': FORMAT, 'computers': computer_count, 'pictures': picture_count}
+                add_bytes(archive, HEADER, json.dumps(header).encode(), mtime)
+
+                rows = Computer.objects.order_by('id').values(*COMPUTER_FIELDS).iterator(chunk_size=batch_size)
+                for index, batch in enumerate(batches(rows, batch_size)):
+                    add_bytes(archive, batch_name(COMPUTERS_DIR, index), ndjson(batch), mtime)
+                log.write(f"{computer_count} computer(s)")
+
+                rows = Picture.objects.order_by('id').values(*PICTURE_FIELDS).iterator(chunk_size=batch_size)
+                done = 0
+                # Files of content-addressed originals, shared by pictures,
+                # already in the archive
+                exported_shared = set()
+                for index, batch in enumerate(batches(rows, batch_size)):
+                    add_bytes(archive, batch_name(PICTURES_DIR, index), ndjson(batch), mtime)
+                    for row in batch:
+                        shared = blob_sha256(row['image']) is not None
+                        for name in picture_files(row):
+                            if shared:
+                                if name in exported_shared:
+                                    continue
+                                exported_shared.add(name)
+                            path = media_path(media_root, name)
+                            if path is None or not os.path.isfile(path):
+                                missing += 1
+                                log.write(f"Missing file {name} of picture {row['id']}")
+                                continue
+                            # Streamed from disk by tarfile
+                            archive.add(path, arcname=f'{MEDIA_DIR}/{name}', recursive=False)
+                            files += 1
+                    done += len(batch)
+                    log.write(f"{done}/{picture_count} pictures")
+        finally:
+            if not to_stdout:
+                output.close()
+        log.write(f"Exported {computer_count} computer(s), {picture_count} picture(s) and {files} file(s)"
+                  + (f", {missing} missing file(s)" if missing else ""))
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+from comcol_backend.models import CollectionVersion
+from comcol_backend.renderers import ColumnarJSONRenderer
+
+# Files mirror the URLs, so that nginx finds /computers/api/computers/1/ at
+# <root>/computers/api/computers/1/index.json
+API_PATH = 'computers/api'
+INDEX = 'index.json'
+# The list in the ?format=columns representation (see renderers.py)
+COLUMNS_INDEX = 'index.columns'
+MANIFEST = 'manifest.json'
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class Command(BaseCommand):
+    help = ("Writes the read-only API responses (computer list, also in columns, computer details, stats and "
+            "settings) as precompressed JSON files that nginx serves without going through Django. Does nothing "
+            "when the collection version is the one of the last snapshot; otherwise the whole collection is "
+            "rendered again, and only the files whose content changed are written.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None,
+                            help="Snapshot directory (default: COMCOL_STATIC_API_DIR).")
+        parser.add_argument('--force', action='store_true',
+                            help="Render and rewrite every file, even when the collection has not changed "
+                                 "(e.g. after an upgrade changed the API).")
+
+    def handle(self, *args, **options):
+        root = str(options['output_dir'] or getattr(settings, 'COMCOL_STATIC_API_DIR', ''))
+        if not root:
+            raise CommandError("No --output-dir and no COMCOL_STATIC_API_DIR setting")
+        manifest_path = os.path.join(root, MANIFEST)
+        previous = {}
+        try:
+            with open(manifest_path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            pass
+        # Read before rendering: a write made meanwhile is exported next time
+        version, updated_at = CollectionVersion.current()
+        collection = [version, updated_at.isoformat() if updated_at is not None else None]
+        if not options['force'] and previous.get('collection') == collection:
+            self.stdout.write(f"{root} is up to date with collection version {version}")
+            return
+        # Manifests of older snapshots only list the files
+        previous = previous.get('files', previous)
+
+        files = self.render()
+        written = 0
+        for name, content in files.items():
+            digest = hashlib.sha256(content).hexdigest()
+            if not options['force'] and previous.get(name) == digest:
+                continue
+            path = os.path.join(root, name)
+            write_atomic(path, content)
+            # mtime=0 keeps the output identical for identical content
+            write_atomic(f"{path}.gz", gzip.compress(content, 9, mtime=0))
+            written += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Wrote {name}")
+
+        removed = 0
+        for name in set(previous) - set(files):
+            path = os.path.join(root, name)
+            remove(path)
+            remove(f"{path}.gz")
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            removed += 1
+
+        manifest = {
+            'collection': collection,
+            'files': {name: hashlib.sha256(content).hexdigest() for name, content in files.items()},
+        }
+        write_atomic(manifest_path, json.dumps(manifest, indent=0, sort_keys=True).encode())
+        self.stdout.write(f"{len(files)} file(s) in {root}: {written} written, {removed} removed")
+
+    def render(self):
+        """
+        Returns ``{relative path: JSON bytes}`` for every response of the
+        snapshot, rendered as the read-only deployment would.
+        """
+        write_enabled = os.environ.pop('COMCOL_WRITE', None)
+        try:
+            host = 'localhost' if 'localhost' in settings.ALLOWED_HOSTS else next(
+                (h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+            client = Client(HTTP_HOST=host, HTTP_ACCEPT='application/json')
+            files = {}
+            for url in ['computers/', 'computers/stats/', 'settings/']:
+                response = client.get(f'/{API_PATH}/{url}')
+                if response.status_code != 200:
+                    raise CommandError(f"/{API_PATH}/{url} returned {response.status_code}")
+                files[f'{API_PATH}/{url}{INDEX}'] = response.content
+        finally:
+            if write_enabled is not None:
+                os.environ['COMCOL_WRITE'] = write_enabled
+
+        # The unpaginated list holds the same representation as the detail
+        # endpoint for each computer, so the details are rendered from it
+        # instead of one request each.
+        renderer = JSONRenderer()
+        computers = json.loads(files[f'{API_PATH}/computers/{INDEX}'])
+        for computer in computers:
+            files[f"{API_PATH}/computers/{computer['id']}/{INDEX}"] = renderer.render(computer)
+        # Same for the columnar list the frontend fetches
+        files[f'{API_PATH}/computers/{COLUMNS_INDEX}'] = ColumnarJSONRenderer().render(computers)
+        return files
@@ -0,0 +1,158 @@
+import json
+import os
+import sys
+import tarfile
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from comcol_backend.archive import (
+    COMPUTER_FIELDS, COMPUTERS_DIR, FORMAT, HEADER, MEDIA_DIR, PICTURE_FIELDS, PICTURES_DIR, media_path,
+)
+from comcol_backend.blobs import acquire_blobs, blob_sha256
+from comcol_backend.image_pipeline import variant_path
+from comcol_backend.models import Computer, DerivativeJob, Picture
+from comcol_backend.signals import collection_changed
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.import"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+def read_ndjson(archive, member):
+    return [json.loads(line) for line in archive.extractfile(member) if line.strip()]
+
+class Command(BaseCommand):
+    help = ("Loads an archive written by export_collection, adding its computers and pictures to this "
+            "collection with new ids and copying their media files.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Archive file to read, or - for the standard input.")
+        parser.add_argument('--workers', type=int, default=4, help="Threads writing the media files.")
+        parser.add_argument('--clear', action='store_true', help="Delete the whole existing collection first.")
+
+    def handle(self, *args, **options):
+        self.media_root = str(settings.MEDIA_ROOT)
+        self.computer_ids = {}
+        self.renamed = {}
+        self.shared = set()
+        self.pending = deque()
+        self.max_pending = options['workers'] * 4
+        self.counts = {'computers': 0, 'pictures': 0, 'files': 0}
+
+        if options['clear']:
+            deleted, _ = Computer.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} existing row(s)")
+
+        source = sys.stdin.buffer if options['input'] == '-' else open(options['input'], 'rb')
+        try:
+            self.executor = ThreadPoolExecutor(max_workers=options['workers'])
+            with self.executor:
+                # Stream mode: members are read in order, never seeking back
+                with tarfile.open(fileobj=source, mode='r|*') as archive:
+                    header = None
+                    for member in archive:
+                        if member.name == HEADER:
+                            header = json.load(archive.extractfile(member))
+                            if header.get('format') != FORMAT:
+                                raise CommandError(f"Unsupported archive format {header.get('format')}")
+                        elif header is None:
+                            raise CommandError(f"Not a collection archive: {member.name} before {HEADER}")
+                        elif member.name.startswith(f'{COMPUTERS_DIR}/'):
+                            self.load_computers(read_ndjson(archive, member))
+                        elif member.name.startswith(f'{PICTURES_DIR}/'):
+                            self.load_pictures(read_ndjson(archive, member))
+                            self.stdout.write(f"{self.counts['pictures']}/{header['pictures']} pictures")
+                        elif member.name.startswith(f'{MEDIA_DIR}/') and member.isfile():
+                            self.copy_media(member.name[len(MEDIA_DIR) + 1:], archive.extractfile(member).read())
+                    self.wait(0)
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+            # Rows already committed stay visible even if a later batch failed
+            if self.computer_ids:
+                collection_changed.send(sender=Computer, computer_ids=list(self.computer_ids.values()))
+
+        self.stdout.write(f"Imported {self.counts['computers']} computer(s), {self.counts['pictures']} picture(s) "
+                          f"and {self.counts['files']} file(s)")
+
+    def load_computers(self, rows):
+        computers = []
+        for row in rows:
+            computers.append(Computer(**{name: row[name] for name in COMPUTER_FIELDS if name in row and name != 'id'}))
+        with transaction.atomic():
+            # SQLite returns the primary keys of bulk inserted rows
+            created = Computer.objects.bulk_create(computers)
+        for row, computer in zip(rows, created):
+            self.computer_ids[row['id']] = computer.pk
+        self.counts['computers'] += len(created)
+
+    def load_pictures(self, rows):
+        # Files of a batch follow its rows, the renames are only kept until
+        # the next batch
+        self.renamed = {}
+        self.shared = set()
+        taken = set(
+            Picture.objects.filter(unique_id__in=[row['unique_id'] for row in rows]).values_list('unique_id', flat=True)
+        )
+        references = {}
+        pictures = []
+        for row in rows:
+            if row['computer_id'] not in self.computer_ids:
+                raise CommandError(f"Picture {row['id']} belongs to computer {row['computer_id']}, not in the archive")
+            fields = {name: row[name] for name in PICTURE_FIELDS if name in row and name not in ('id', 'computer_id')}
+            sha256 = blob_sha256(row['image'])
+            if sha256:
+                # Content-addressed: the same name holds the same bytes here,
+                # existing files are kept and shared
+                references[sha256] = references.get(sha256, 0) + 1
+                self.shared.update([row['image'], *row['variants'].values()])
+            elif row['unique_id'] in taken or self.exists(row['image']):
+                # Already in this instance (e.g. imported twice): store the
+                # files under a new name rather than overwriting them
+                self.rename(fields)
+            pictures.append((sha256, Picture(computer_id=self.computer_ids[row['computer_id']], **fields)))
+        with transaction.atomic():
+            blobs = acquire_blobs(references)
+            for sha256, picture in pictures:
+                picture.blob = blobs.get(sha256)
+            created = Picture.objects.bulk_create([picture for _, picture in pictures])
+            DerivativeJob.objects.bulk_create([
+                DerivativeJob(picture=picture) for picture in created
+                if picture.variants_status == Picture.VARIANTS_PENDING
+            ])
+        self.counts['pictures'] += len(created)
+
+    def exists(self, name):
+        path = media_path(self.media_root, name) if name else None
+        return path is not None and os.path.exists(path)
+
+    def rename(self, fields):
+        unique_id = str(uuid.uuid4())
+        image = os.path.join(os.path.dirname(fields['image']), f"{unique_id}.{fields['extension']}")
+        self.renamed[fields['image']] = image
+        variants = {}
+        for suffix, name in fields['variants'].items():
+            variants[suffix] = variant_path(image, suffix)
+            self.renamed[name] = variants[suffix]
+        fields.update(unique_id=unique_id, image=image, variants=variants)
+
+    def copy_media(self, name, data):
+        name = self.renamed.get(name, name)
+        path = media_path(self.media_root, name)
+        if path is None:
+            raise CommandError(f"Refusing to write {name} outside MEDIA_ROOT")
+        if name in self.shared and os.path.exists(path):
+            return
+        # Bounded number of files in flight, so memory stays constant
+        self.wait(self.max_pending)
+        self.pending.append(self.executor.submit(write_file, path, data))
+        self.counts['files'] += 1
+
+    def wait(self, limit):
+        while len(self.pending) > limit:
+            self.pending.popleft().result()
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from django.core.management.base import BaseCommand
+from comcol_backend.image_pipeline import get_variant_sizes, process_picture
+from comcol_backend.jobs import claim_jobs, complete_job, fail_job, requeue_stale_jobs
+
+class Command(BaseCommand):
+    help = "Generates the picture variants queued by uploads, using a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of resizing processes (default: number of cores).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Jobs claimed per poll (default: twice the number of workers).")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help="Requeue jobs that have been running for longer than this many seconds.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the queue and exit instead of polling forever.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size'] or workers * 2
+        worker_tag = f"{socket.gethostname()}-{os.getpid()}"
+
+        requeued = requeue_stale_jobs(options['stale_after'])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        pool = self.make_pool(workers)
+        self.stdout.write(f"Processing derivatives with {workers} worker process(es)")
+        try:
+            while True:
+                jobs = claim_jobs(batch_size, worker=worker_tag)
+                if not jobs:
+                    if options['once']:
+                        break
+                    requeue_stale_jobs(options['stale_after'])
+                    time.sleep(options['poll_interval'])
+                    continue
+                pool = self.run_batch(pool, jobs, workers)
+        finally:
+            pool.shutdown()
+
+    def run_batch(self, pool, jobs, workers):
+        sizes = get_variant_sizes()
+        futures = {pool.submit(process_picture, job.picture.image.path, sizes): job for job in jobs}
+        broken = False
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                written, metadata = future.result()
+            except BrokenProcessPool as e:
+                broken = True
+                fail_job(job, e)
+            except Exception as e:
+                fail_job(job, e)
+            else:
+                complete_job(job, written, metadata)
+                self.stdout.write(f"Generated variants for picture {job.picture_id}")
+        if broken:
+            # A child died (most likely out of memory), start a fresh pool
+            pool.shutdown(wait=False)
+            pool = self.make_pool(workers)
+        return pool
+
+    def make_pool(self, workers):
+        # The children only do image work: spawn them so that they do not
+        # inherit the database connection of this process.
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
@@ -0,0 +1,216 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from comcol_backend.blobs import blob_sha256, get_storage
+from comcol_backend.image_pipeline import get_variant_sizes, repair_variants, variant_path
+from comcol_backend.models import DerivativeJob, Picture
+from comcol_backend.signals import collection_changed
+
+PICTURE_FIELDS = ('id', 'computer_id', 'image', 'width', 'height', 'variants', 'variants_status')
+
+def batches(rows, size):
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+class Command(BaseCommand):
+    help = ("Checks that the variants of every picture exist, decode and have the current sizes, and generates "
+            "the wrong ones again from the originals, using a pool of worker processes. Interrupted runs resume "
+            "from a checkpoint file.")
+
+    def add_arguments(self, parser):
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--only-missing', action='store_true',
+                          help="Only check that the variants exist, without decoding them.")
+        mode.add_argument('--force', action='store_true', help="Generate the variants of every picture again.")
+        parser.add_argument('--checksums', action='store_true',
+                            help="Check content-addressed originals against the SHA-256 in their name.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report the pictures with wrong variants.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of worker processes (default: number of cores).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Pictures per checkpoint (default: 16 per worker).")
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / 'regenerate_variants.checkpoint'),
+                            help="File recording the progress of the run.")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint of an interrupted run.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size'] or workers * 16
+        self.sizes = get_variant_sizes()
+        self.suffixes = {suffix for _, suffix in self.sizes}
+        self.options = options
+        self.storage = get_storage()
+        mode = 'force' if options['force'] else 'only-missing' if options['only_missing'] else 'verify'
+        # A checkpoint is only resumed by a run that would do the same work
+        run = {'mode': mode, 'checksums': options['checksums'], 'dry_run': options['dry_run'],
+               'sizes': [list(size) for size in self.sizes]}
+
+        checkpoint = self.read_checkpoint(options['checkpoint'], run) if not options['restart'] else None
+        last_id = checkpoint['last_id'] if checkpoint else 0
+        self.counts = checkpoint['counts'] if checkpoint else {'checked': 0, 'wrong': 0, 'regenerated': 0, 'failed': 0}
+        if checkpoint:
+            self.stdout.write(f"Resuming after picture {last_id} ({self.counts['checked']} already checked)")
+
+        pictures = Picture.objects.exclude(image='').filter(id__gt=last_id).order_by('id')
+        remaining = pictures.count()
+        total = remaining + self.counts['checked']
+        # Shared content-addressed originals already handled in this run,
+        # with the variants and metadata generated for them if any
+        self.done_images = {}
+
+        self.stdout.write(f"Checking {remaining} picture(s) ({mode}) with {workers} worker process(es)")
+        pool = self.make_pool(workers)
+        start = time.perf_counter()
+        checked = 0
+        rows = pictures.values(*PICTURE_FIELDS).iterator(chunk_size=batch_size)
+        try:
+            for batch in batches(rows, batch_size):
+                pool = self.run_batch(pool, batch, workers)
+                checked += len(batch)
+                self.write_checkpoint(options['checkpoint'], {**run, 'last_id': batch[-1]['id'], 'counts': self.counts})
+                elapsed = time.perf_counter() - start
+                rate = checked / elapsed if elapsed else 0
+                eta = format_duration((remaining - checked) / rate) if rate else '?'
+                self.stdout.write(
+                    f"{self.counts['checked']}/{total} pictures, {self.counts['wrong']} wrong, "
+                    f"{self.counts['regenerated']} regenerated, {self.counts['failed']} failed, "
+                    f"{rate:.1f} pictures/s, ETA {eta}"
+                )
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.stderr.write("Interrupted, run the same command again to resume")
+            raise SystemExit(1)
+        finally:
+            rows.close()
+            pool.shutdown()
+
+        if os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Checked {self.counts['checked']} picture(s) in {format_duration(elapsed)}: {self.counts['wrong']} with "
+            f"wrong variants, {self.counts['regenerated']} regenerated, {self.counts['failed']} failed"
+        )
+
+    def run_batch(self, pool, batch, workers):
+        options = self.options
+        # Pictures sharing a content-addressed original share its variants,
+        # which are checked and generated once
+        by_image = {}
+        for row in batch:
+            by_image.setdefault(row['image'], []).append(row)
+
+        futures = {}
+        updated = []
+        for name, rows in by_image.items():
+            sha256 = blob_sha256(name)
+            if sha256 and name in self.done_images:
+                if self.done_images[name] and not options['dry_run']:
+                    self.update_pictures(rows, *self.done_images[name])
+                    updated.extend(rows)
+                    self.counts['regenerated'] += len(rows)
+                continue
+            first = rows[0]
+            original_size = (first['width'], first['height']) if first['width'] and first['height'] else None
+            future = pool.submit(
+                repair_variants, self.storage.path(name), self.sizes, original_size,
+                decode=not options['only_missing'], force=options['force'],
+                sha256=sha256 if options['checksums'] else None, dry_run=options['dry_run'],
+            )
+            futures[future] = rows
+
+        failed = []
+        broken = False
+        for future in as_completed(futures):
+            rows = futures[future]
+            name = rows[0]['image']
+            try:
+                problems, written, metadata = future.result()
+            except BrokenProcessPool as e:
+                broken = True
+                failed.extend(rows)
+                self.stderr.write(f"Picture(s) {', '.join(str(row['id']) for row in rows)}: {e}")
+                continue
+            except Exception as e:
+                failed.extend(rows)
+                self.stderr.write(f"Picture(s) {', '.join(str(row['id']) for row in rows)} ({name}): {e}")
+                continue
+            # Manifest listing other variants than the current sizes (e.g.
+            # of a pending picture whose files are there)
+            outdated = [row for row in rows if set(row['variants']) != self.suffixes]
+            if problems or outdated:
+                self.counts['wrong'] += len(rows)
+                if options['dry_run'] or options['verbosity'] > 1:
+                    described = ', '.join(f"{suffix} {problem}" for suffix, problem in sorted(problems.items()))
+                    self.stdout.write(f"Picture(s) {', '.join(str(row['id']) for row in rows)}: "
+                                      f"{described or 'outdated manifest'}")
+            generated = None
+            if written is not None:
+                generated = ({suffix: variant_path(name, suffix) for suffix in written}, metadata)
+                self.update_pictures(rows, *generated)
+                updated.extend(rows)
+                self.counts['regenerated'] += len(rows)
+            elif outdated and not problems and not options['dry_run']:
+                # The files are fine, only the manifest is updated
+                variants = {suffix: variant_path(name, suffix) for suffix in self.suffixes}
+                self.update_pictures(outdated, variants, {})
+                updated.extend(outdated)
+            if blob_sha256(name):
+                self.done_images[name] = generated
+
+        self.counts['checked'] += len(batch)
+        self.counts['failed'] += len(failed)
+        if failed and not options['dry_run']:
+            Picture.objects.filter(pk__in=[row['id'] for row in failed]).update(variants_status=Picture.VARIANTS_FAILED)
+        changed = updated + ([] if options['dry_run'] else failed)
+        if updated:
+            # Queued jobs of these pictures would only redo the same work
+            DerivativeJob.objects.filter(
+                picture_id__in=[row['id'] for row in updated], status=DerivativeJob.QUEUED
+            ).update(status=DerivativeJob.DONE)
+        if changed:
+            collection_changed.send(sender=Picture, computer_ids=sorted({row['computer_id'] for row in changed}))
+        if broken:
+            # A child died (most likely out of memory), start a fresh pool
+            pool.shutdown(wait=False)
+            pool = self.make_pool(workers)
+        return pool
+
+    def update_pictures(self, rows, variants, metadata):
+        Picture.objects.filter(pk__in=[row['id'] for row in rows]).update(
+            variants_status=Picture.VARIANTS_READY, variants=variants, **metadata
+        )
+
+    def read_checkpoint(self, path, run):
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        if any(checkpoint.get(key) != value for key, value in run.items()):
+            raise CommandError(f"{path} was written by a run with other options or variant sizes, "
+                               "use --restart to start over")
+        return checkpoint
+
+    def write_checkpoint(self, path, checkpoint):
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(temporary, path)
+
+    def make_pool(self, workers):
+        # The children only do image work: spawn them so that they do not
+        # inherit the database connection of this process.
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from comcol_backend.resizing import get_resize_cache
+
+class Command(BaseCommand):
+    help = "Shows the size of the cache of pictures resized on demand, evicts it down to its budget, or clears it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', choices=['stats', 'evict', 'clear'], default='stats')
+
+    def handle(self, *args, **options):
+        resize_cache = get_resize_cache()
+        if resize_cache is None:
+            raise CommandError("Resizing on demand is disabled (COMCOL_RESIZE_CACHE_DIR is None)")
+
+        if options['action'] == 'clear':
+            resize_cache.clear()
+            self.stdout.write("Resize cache cleared")
+        elif options['action'] == 'evict':
+            deleted, freed = resize_cache.evict()
+            self.stdout.write(f"Evicted {deleted} file(s), {freed / 1024 / 1024:.1f} MB")
+        else:
+            entries, total = resize_cache.scan()
+            budget = resize_cache.budget_bytes
+            self.stdout.write(f"files: {len(entries)}  size: {total / 1024 / 1024:.1f} MB  "
+                              f"budget: {budget / 1024 / 1024:.1f} MB ({total / budget:.0%} used)")
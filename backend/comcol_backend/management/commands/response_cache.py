@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from comcol_backend.response_cache import get_response_cache
+
+class Command(BaseCommand):
+    help = "Shows the hit/miss counters of the API response cache, or clears it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', choices=['stats', 'reset-stats', 'clear'], default='stats')
+
+    def handle(self, *args, **options):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            raise CommandError("Response caching is disabled (COMCOL_RESPONSE_CACHE is None)")
+
+        if options['action'] == 'clear':
+            response_cache.clear()
+            self.stdout.write("Response cache cleared")
+        elif options['action'] == 'reset-stats':
+            response_cache.reset_stats()
+            self.stdout.write("Response cache counters reset")
+        else:
+            stats = response_cache.stats()
+            ratio = 'n/a' if stats['hit_ratio'] is None else f"{stats['hit_ratio']:.1%}"
+            self.stdout.write(f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {ratio}")
@@ -0,0 +1,240 @@
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from io import BytesIO
+import django
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from comcol_backend.models import Computer, Picture
+from comcol_backend.response_cache import get_response_cache
+
+API = '/computers/api'
+OPERATIONS = ['list', 'list_page', 'detail', 'search', 'reorder', 'upload', 'upload_heic']
+# Operations that write and need COMCOL_WRITE. Uploaded pictures are deleted
+# afterwards, reordered ones keep their shuffled order.
+WRITE_OPERATIONS = {'reorder', 'upload', 'upload_heic'}
+# Metrics compared with --baseline, a higher value is a regression
+COMPARED_METRICS = ['p95_ms', 'queries_max', 'bytes_median']
+
+def percentile(sorted_values, fraction):
+    # Nearest rank, so that p99 of a short run is its slowest sample
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def summarize(operation, samples):
+    timings = sorted(sample['seconds'] * 1000 for sample in samples)
+    queries = [sample['queries'] for sample in samples]
+    sizes = [sample['bytes'] for sample in samples]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample['status'])] = statuses.get(str(sample['status']), 0) + 1
+    return {
+        'operation': operation,
+        'requests': len(samples),
+        'status_codes': statuses,
+        'cache_hits': sum(1 for sample in samples if sample['cache'] == 'HIT'),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries_median': statistics.median(queries),
+        'queries_max': max(queries),
+        'bytes_median': statistics.median(sizes),
+        'bytes_max': max(sizes),
+    }
+
+def sample_jpeg(width=1600, height=1200):
+    noise = Image.effect_noise((width, height), 64)
+    image = Image.merge('RGB', (noise, noise.transpose(Image.FLIP_LEFT_RIGHT), noise.transpose(Image.FLIP_TOP_BOTTOM)))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+class Command(BaseCommand):
+    help = ("Times the main API operations with the Django test client against the current database "
+            "and reports latency percentiles, query counts and response sizes as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', nargs='+', choices=OPERATIONS,
+                            default=['list', 'list_page', 'detail', 'search', 'reorder', 'upload'])
+        parser.add_argument('--iterations', type=int, default=50, help="Timed requests per operation.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per operation.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cold', action='store_true', help="Clear the response cache before every request.")
+        parser.add_argument('--heic-file', help="HEIC image for upload_heic (pyheif can only decode).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--baseline', help="JSON report of a previous run to compare with.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Relative increase over the baseline reported as a regression.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1")
+        if 'upload_heic' in options['operations'] and not options['heic_file']:
+            raise CommandError("upload_heic needs --heic-file")
+        if not Computer.objects.exists():
+            raise CommandError("The collection is empty, run seed_collection first")
+
+        self.rng = random.Random(options['seed'])
+        self.cold = options['cold']
+        self.response_cache = get_response_cache()
+        host = 'localhost' if 'localhost' in settings.ALLOWED_HOSTS else next(
+            (h for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        self.client = Client(HTTP_HOST=host)
+        self.computer_ids = list(Computer.objects.values_list('id', flat=True))
+        self.uploaded_ids = []
+
+        write_enabled = os.environ.get('COMCOL_WRITE')
+        if WRITE_OPERATIONS.intersection(options['operations']):
+            os.environ['COMCOL_WRITE'] = '1'
+        try:
+            results = []
+            for operation in options['operations']:
+                requests = getattr(self, f'requests_{operation}')(options)
+                for _ in range(options['warmup']):
+                    self.timed(next(requests))
+                samples = [self.timed(next(requests)) for _ in range(options['iterations'])]
+                results.append(summarize(operation, samples))
+                self.stderr.write(f"{operation}: p50 {results[-1]['p50_ms']} ms, p95 {results[-1]['p95_ms']} ms")
+        finally:
+            self.remove_uploads()
+            if write_enabled is None:
+                os.environ.pop('COMCOL_WRITE', None)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'computers': len(self.computer_ids),
+            'pictures': Picture.objects.count(),
+            'iterations': options['iterations'],
+            'cold': self.cold,
+            'results': results,
+        }
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = self.compare(json.load(f), results, options['tolerance'])
+            report['regressions'] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(
+                    f"Regression in {regression['operation']} {regression['metric']}: "
+                    f"{regression['baseline']} -> {regression['current']}"
+                )
+            sys.exit(1)
+
+    def timed(self, request):
+        method, path, data = request
+        if self.cold and self.response_cache is not None:
+            self.response_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            if method == 'get':
+                response = self.client.get(path)
+            elif method == 'post_json':
+                response = self.client.post(path, json.dumps(data), content_type='application/json')
+            else:
+                response = self.client.post(path, data)
+            content = response.content
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise CommandError(f"{method} {path} returned {response.status_code}: {content[:200]!r}")
+        if path.endswith('upload-picture/'):
+            self.uploaded_ids.append(response.json()['id'])
+        return {
+            'seconds': elapsed,
+            'queries': len(queries),
+            'bytes': len(content),
+            'status': response.status_code,
+            'cache': response.get('X-Cache'),
+        }
+
+    def requests_list(self, options):
+        while True:
+            yield 'get', f'{API}/computers/', None
+
+    def requests_list_page(self, options):
+        while True:
+            yield 'get', f'{API}/computers/?page_size=50', None
+
+    def requests_detail(self, options):
+        while True:
+            yield 'get', f'{API}/computers/{self.rng.choice(self.computer_ids)}/', None
+
+    def requests_search(self, options):
+        terms = list(Computer.objects.exclude(maker__isnull=True).values_list('maker', flat=True).distinct()[:50])
+        terms += [name.split()[-1] for name in Computer.objects.values_list('name', flat=True)[:50]]
+        while True:
+            yield 'get', f'{API}/computers/?search={self.rng.choice(terms)}&page_size=50', None
+
+    def requests_reorder(self, options):
+        # The computers with the most pictures, where reordering costs the most
+        computers = list(
+            Computer.objects.annotate(picture_count=Count('pictures'))
+            .filter(picture_count__gt=1).order_by('-picture_count').values_list('id', flat=True)[:20]
+        )
+        if not computers:
+            raise CommandError("reorder needs computers with at least two pictures")
+        while True:
+            computer_id = self.rng.choice(computers)
+            picture_ids = list(Picture.objects.filter(computer_id=computer_id).values_list('id', flat=True))
+            self.rng.shuffle(picture_ids)
+            yield 'post_json', f'{API}/computers/{computer_id}/reorder-images/', {'order': picture_ids}
+
+    def requests_upload(self, options):
+        data = sample_jpeg()
+        while True:
+            image = SimpleUploadedFile('benchmark.jpg', data, content_type='image/jpeg')
+            yield 'post', f'{API}/upload-picture/', {'computer': self.rng.choice(self.computer_ids), 'image': image}
+
+    def requests_upload_heic(self, options):
+        with open(options['heic_file'], 'rb') as f:
+            data = f.read()
+        while True:
+            image = SimpleUploadedFile('benchmark.heic', data, content_type='image/heic')
+            yield 'post', f'{API}/upload-picture/', {'computer': self.rng.choice(self.computer_ids), 'image': image}
+
+    def remove_uploads(self):
+        # Deleting the pictures also deletes their queued derivative jobs.
+        # Content-addressed files go with the last picture using them.
+        for picture in Picture.objects.filter(id__in=self.uploaded_ids):
+            if picture.blob_id is None:
+                picture.image.delete(save=False)
+            picture.delete()
+
+    def compare(self, baseline, results, tolerance):
+        previous = {row['operation']: row for row in baseline.get('results', [])}
+        regressions = []
+        for row in results:
+            before = previous.get(row['operation'])
+            if before is None:
+                continue
+            for metric in COMPARED_METRICS:
+                if metric in before and row[metric] > before[metric] * (1 + tolerance):
+                    regressions.append({
+                        'operation': row['operation'],
+                        'metric': metric,
+                        'baseline': before[metric],
+                        'current': row[metric],
+                    })
+        return regressions
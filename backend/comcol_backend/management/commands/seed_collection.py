@@ -0,0 +1,124 @@
+import os
+import random
+import tempfile
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from comcol_backend.image_pipeline import get_variant_sizes, process_picture, variant_path
+from comcol_backend.models import Computer, Picture
+from comcol_backend.signals import collection_changed
+
+PICTURES_DIR = 'computer_pictures'
+
+MAKERS = ['Apple', 'Atari', 'Commodore', 'Sinclair', 'Amstrad', 'Acorn', 'Thomson', 'Oric', 'Tandy', 'Texas Instruments',
+          'IBM', 'Compaq', 'NEC', 'Sharp', 'Sony', 'Philips', 'Exelvision', 'Matra', 'Dragon', 'Camputers']
+MODELS = ['Personal', 'Home', 'Micro', 'Professional', 'Portable', 'Junior', 'Plus', 'Color', 'Executive', 'Laptop']
+WORDS = ['keyboard', 'cassette', 'floppy', 'disk', 'drive', 'monitor', 'basic', 'cartridge', 'joystick', 'memory',
+         'expansion', 'printer', 'modem', 'sound', 'graphics', 'sprites', 'z80', '6502', '68000', '8088', 'colour',
+         'television', 'rare', 'boxed', 'working', 'restored', 'recapped', 'prototype', 'school', 'business']
+
+def make_templates(directory, count, size, rng):
+    """
+    Renders ``count`` small JPEGs and their variants, and returns the bytes
+    of each as ``{'original': ..., suffix: ...}`` with their ``metadata``.
+    Pictures are written as copies of these, so seeding does not resize
+    anything.
+    """
+    sizes = get_variant_sizes()
+    templates = []
+    for index in range(count):
+        noise = Image.effect_noise((size, size * 3 // 4), 48)
+        tint = Image.new('RGB', noise.size, tuple(rng.randrange(256) for _ in range(3)))
+        image = Image.blend(Image.merge('RGB', (noise, noise, noise)), tint, 0.6)
+        path = os.path.join(directory, f"template-{index}.jpeg")
+        image.save(path, format='JPEG', quality=80)
+        files = {'original': path}
+        written, metadata = process_picture(path, sizes)
+        files.update(written)
+        template = {'metadata': metadata}
+        for key, file_path in files.items():
+            with open(file_path, 'rb') as f:
+                template[key] = f.read()
+        templates.append(template)
+    return templates
+
+class Command(BaseCommand):
+    help = "Adds a synthetic collection of computers and pictures (with real image files) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--computers', type=int, default=10000)
+        parser.add_argument('--pictures', type=int, default=100000, help="Total number of pictures, spread over the computers.")
+        parser.add_argument('--image-size', type=int, default=320, help="Width in pixels of the seeded originals.")
+        parser.add_argument('--templates', type=int, default=32, help="Number of distinct images to draw pictures from.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, the same seed gives the same collection.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true', help="Delete the whole existing collection first.")
+
+    def handle(self, *args, **options):
+        if options['computers'] < 1 or options['pictures'] < 0:
+            raise CommandError("--computers must be at least 1 and --pictures positive")
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            deleted, _ = Computer.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} existing row(s)")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            templates = make_templates(workdir, options['templates'], options['image_size'], rng)
+        suffixes = [suffix for _, suffix in get_variant_sizes()]
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, PICTURES_DIR), exist_ok=True)
+
+        computer_ids = []
+        with transaction.atomic():
+            for start in range(0, options['computers'], batch_size):
+                computers = []
+                for _ in range(start, min(start + batch_size, options['computers'])):
+                    maker = rng.choice(MAKERS)
+                    computers.append(Computer(
+                        name=f"{maker} {rng.choice(MODELS)} {rng.randrange(1, 1000)}",
+                        maker=maker,
+                        year=rng.randrange(1975, 2000),
+                        description=' '.join(rng.choices(WORDS, k=rng.randrange(5, 40))),
+                        url=f"https://en.wikipedia.org/wiki/Seeded_{uuid.UUID(int=rng.getrandbits(128)).hex}",
+                        favorite=rng.choice(['', '', '', 'yes']),
+                    ))
+                # SQLite returns the primary keys of bulk inserted rows
+                computer_ids.extend(computer.pk for computer in Computer.objects.bulk_create(computers))
+
+            # Spread the pictures unevenly, like a real collection
+            owners = sorted(rng.choices(computer_ids, k=options['pictures']))
+            orders = {}
+            for start in range(0, len(owners), batch_size):
+                pictures = []
+                for computer_id in owners[start:start + batch_size]:
+                    orders[computer_id] = orders.get(computer_id, 0) + 1
+                    unique_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                    name = f"{PICTURES_DIR}/{unique_id}.jpeg"
+                    template = rng.choice(templates)
+                    with open(os.path.join(settings.MEDIA_ROOT, name), 'wb') as f:
+                        f.write(template['original'])
+                    variants = {}
+                    for suffix in suffixes:
+                        variants[suffix] = variant_path(name, suffix)
+                        with open(os.path.join(settings.MEDIA_ROOT, variants[suffix]), 'wb') as f:
+                            f.write(template[suffix])
+                    pictures.append(Picture(
+                        computer_id=computer_id,
+                        image=name,
+                        order=orders[computer_id],
+                        unique_id=unique_id,
+                        extension='jpeg',
+                        variants_status=Picture.VARIANTS_READY,
+                        variants=variants,
+                        **template['metadata'],
+                    ))
+                Picture.objects.bulk_create(pictures)
+                self.stdout.write(f"{min(start + batch_size, len(owners))}/{len(owners)} pictures")
+
+            # bulk_create sends no post_save
+            collection_changed.send(sender=Computer, computer_ids=computer_ids)
+
+        self.stdout.write(f"Seeded {len(computer_ids)} computer(s) and {len(owners)} picture(s)")
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comcol_backend', '0009_alter_computer_favorite'),
+    ]
+
+    operations = [
+        # Pictures uploaded so far had their variants generated inline
+        migrations.AddField(
+            model_name='picture',
+            name='variants_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='picture',
+            name='variants_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', editable=False, max_length=10),
+        ),
+        migrations.CreateModel(
+            name='DerivativeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, default='', max_length=64)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('picture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivative_jobs', to='comcol_backend.picture')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='derivativejob',
+            index=models.Index(fields=['status', 'id'], name='comcol_back_status_28b90d_idx'),
+        ),
+    ]
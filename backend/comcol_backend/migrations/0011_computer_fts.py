@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Full-text index over the searchable Computer columns, kept in sync by
+# triggers so that bulk inserts and queryset updates are indexed as well.
+#
+# Note: SQLite drops the triggers when Django rebuilds the computer table
+# (e.g. on AlterField), so such migrations must run CREATE_TRIGGERS again.
+
+FTS_TABLE = 'comcol_backend_computer_fts'
+COLUMNS = 'name, maker, description, favorite'
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    {COLUMNS},
+    content='comcol_backend_computer',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+"""
+
+CREATE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON comcol_backend_computer BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {COLUMNS})
+        VALUES (new.id, new.name, new.maker, new.description, new.favorite);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON comcol_backend_computer BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS})
+        VALUES ('delete', old.id, old.name, old.maker, old.description, old.favorite);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON comcol_backend_computer BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS})
+        VALUES ('delete', old.id, old.name, old.maker, old.description, old.favorite);
+        INSERT INTO {FTS_TABLE}(rowid, {COLUMNS})
+        VALUES (new.id, new.name, new.maker, new.description, new.favorite);
+    END
+    """,
+]
+
+REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+def create_fts(apps, schema_editor):
+    # FTS5 is SQLite specific, other databases fall back to icontains search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in [CREATE_TABLE, *CREATE_TRIGGERS, REBUILD]:
+        schema_editor.execute(statement)
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP:
+        schema_editor.execute(statement)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comcol_backend', '0010_picture_variants_status_derivativejob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
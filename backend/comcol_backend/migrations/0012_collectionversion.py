@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 14:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_singleton(apps, schema_editor):
+    CollectionVersion = apps.get_model('comcol_backend', 'CollectionVersion')
+    CollectionVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comcol_backend', '0011_computer_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_singleton, migrations.RunPython.noop),
+    ]
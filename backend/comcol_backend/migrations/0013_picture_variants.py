@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 14:10
+
+from django.db import migrations, models
+import os
+
+# Variants generated by the upload code so far
+SUFFIXES = ['thumb', 'gallery', 'portrait']
+
+
+def fill_variants(apps, schema_editor):
+    Picture = apps.get_model('comcol_backend', 'Picture')
+    pictures = []
+    for picture in Picture.objects.filter(variants_status='ready').exclude(image='').only('id', 'image'):
+        base, ext = os.path.splitext(picture.image.name)
+        picture.variants = {suffix: f"{base}-{suffix}{ext}" for suffix in SUFFIXES}
+        pictures.append(picture)
+    Picture.objects.bulk_update(pictures, ['variants'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comcol_backend', '0012_collectionversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='picture',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(fill_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comcol_backend', '0015_image_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='computer',
+            index=models.Index(fields=['maker', 'year', 'name'], name='computer_maker_year_name'),
+        ),
+        migrations.AddIndex(
+            model_name='computer',
+            index=models.Index(fields=['year', 'name'], name='computer_year_name'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 15:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comcol_backend', '0016_computer_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageblob',
+            name='acquired_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
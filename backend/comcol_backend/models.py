@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 import os
 
@@ -18,15 +19,133 @@ class Computer(models.Model):
     url = models.URLField(blank=True, null=True)
     favorite = models.TextField(blank=True, default='')  # Changed from CharField to TextField
 
+    class Meta:
+        indexes = [
+            # Filters and facets by maker, then year range (see filters.py
+            # and stats.py); name makes them covering for sorted listings
+            models.Index(fields=['maker', 'year', 'name'], name='computer_maker_year_name'),
+            # Year ranges and counts per year or decade
+            models.Index(fields=['year', 'name'], name='computer_year_name'),
+        ]
+
     def __str__(self):
         return self.name
 
+class ImageBlob(models.Model):
+    """
+    A content-addressed original, stored once as
+    ``computer_pictures/<sha256>.jpeg`` however many pictures use it.
+    ``refcount`` is the number of those pictures: the files are deleted when
+    it drops to zero (see blobs.py).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time acquire_blob() added references: recount_blobs() leaves the
+    # recent ones alone, their pictures may not exist yet
+    acquired_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Blob {self.sha256} ({self.refcount} picture(s))"
+
 class Picture(models.Model):
+    VARIANTS_PENDING = 'pending'
+    VARIANTS_READY = 'ready'
+    VARIANTS_FAILED = 'failed'
+    VARIANTS_STATUS_CHOICES = [
+        (VARIANTS_PENDING, 'Pending'),
+        (VARIANTS_READY, 'Ready'),
+        (VARIANTS_FAILED, 'Failed'),
+    ]
+
     computer = models.ForeignKey(Computer, related_name='pictures', on_delete=models.CASCADE)
     image = models.ImageField(upload_to=picture_upload_to)
+    # Set for content-addressed uploads, None for pictures stored under their
+    # unique_id before
+    blob = models.ForeignKey(ImageBlob, related_name='pictures', null=True, blank=True, editable=False,
+                             on_delete=models.PROTECT)
     order = models.PositiveIntegerField(default=0)
     unique_id = models.CharField(max_length=36, editable=False, db_index=True)
     extension = models.CharField(max_length=10, editable=False, default='jpeg')
+    # Whether the thumb/gallery/portrait derivatives have been generated yet
+    variants_status = models.CharField(max_length=10, choices=VARIANTS_STATUS_CHOICES, default=VARIANTS_PENDING, editable=False)
+    # Relative paths of the generated variants, e.g. {"thumb": "computer_pictures/<uuid>-thumb.jpeg"},
+    # stored when they are ready so that serializing does not recompute them
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Computed with the variants, so that clients can lay pictures out and
+    # show a placeholder before any image arrives
+    width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    height = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    dominant_color = models.CharField(max_length=7, blank=True, default='', editable=False)
+    # Tiny PNG as a data URI
+    placeholder = models.TextField(blank=True, default='', editable=False)
+
+    def __str__(self):
+        return f"Image for {self.computer.name}"
+
+class DerivativeJob(models.Model):
+    """
+    A queued request to generate the resized variants of a picture.
+
+    Jobs are picked up by the ``process_derivatives`` management command so
+    that uploads do not have to wait for the resizing.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    picture = models.ForeignKey(Picture, related_name='derivative_jobs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Derivatives for picture {self.picture_id} ({self.status})"
+class CollectionVersion(models.Model):
+    """
+    Single-row stamp bumped on every write to the collection. Read endpoints
+    derive their ETag and Last-Modified headers from it.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    SINGLETON_ID = 1
+
+    @classmethod
+    def current(cls):
+        """
+        Returns ``(version, updated_at)``, without writing to the database so
+        that it also works on a read-only one.
+        """
+        row = cls.objects.filter(pk=cls.SINGLETON_ID).values_list('version', 'updated_at').first()
+        return row or (0, None)
+
+    @classmethod
+    async def acurrent(cls):
+        row = await cls.objects.filter(pk=cls.SINGLETON_ID).values_list('version', 'updated_at').afirst()
+        return row or (0, None)
+
+    @classmethod
+    def bump(cls):
+        now = timezone.now()
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(version=models.F('version') + 1, updated_at=now)
+        if not updated:
+            cls.objects.get_or_create(pk=cls.SINGLETON_ID, defaults={'version': 1, 'updated_at': now})
 
     def __str__(self):
-        return f"Image for {self.computer.name}"
\ No newline at end of file
+        return f"Collection version {self.version}"
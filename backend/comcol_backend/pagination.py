@@ -0,0 +1,48 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class ComputerCursorPagination(CursorPagination):
+    """
+    Opt-in keyset pagination for the computer list.
+
+    The list is only paginated when the client asks for it with ``page_size``
+    or ``cursor``, so existing callers keep receiving the whole collection.
+    Pages are keyed on the primary key, which is always indexed.
+    """
+    ordering = 'id'
+    page_size = None
+    default_page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        return super().get_page_size(request) or self.default_page_size
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    Opt-in pagination of search results, which keeps their rank order.
+
+    A cursor can only follow the ordering it is keyed on, and re-sorting the
+    matches by ``id`` would lose the ranking, so pages are taken by offset
+    instead: ``page_size`` and ``offset``, same opt-in and limits as
+    ComputerCursorPagination.
+    """
+    default_limit = ComputerCursorPagination.default_page_size
+    limit_query_param = 'page_size'
+    max_limit = ComputerCursorPagination.max_page_size
+
+    def get_limit(self, request):
+        params = request.query_params
+        if self.limit_query_param not in params and self.offset_query_param not in params:
+            return None
+        return super().get_limit(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Stable pages when the matches are not ranked (icontains fallback)
+        if not queryset.ordered:
+            queryset = queryset.order_by('id')
+        return super().paginate_queryset(queryset, request, view)
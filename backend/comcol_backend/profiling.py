@@ -0,0 +1,175 @@
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+slow_request_logger = logging.getLogger('comcol_backend.slow_requests')
+
+# The profile of the request being handled, None when profiling is off
+_current = ContextVar('comcol_profile', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+
+def fingerprint(sql):
+    """
+    Normalizes a query so that the same statement with other parameters, or
+    a different number of ``IN`` values, has the same fingerprint.
+    """
+    sql = _NUMBER.sub('?', _STRING.sub('?', sql))
+    return _PLACEHOLDERS.sub('(...)', sql)
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = {}
+        self.queries = []
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0) + seconds
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def server_timing(self, total):
+        db = sum(duration for _, duration in self.queries)
+        entries = [f'db;dur={db * 1000:.1f};desc="{len(self.queries)} queries"']
+        entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.timings.items()]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+    def fingerprints(self):
+        by_fingerprint = {}
+        for sql, duration in self.queries:
+            entry = by_fingerprint.setdefault(fingerprint(sql), {'count': 0, 'ms': 0})
+            entry['count'] += 1
+            entry['ms'] += duration * 1000
+        rows = [{'sql': sql, 'count': e['count'], 'ms': round(e['ms'], 2)} for sql, e in by_fingerprint.items()]
+        return sorted(rows, key=lambda row: row['ms'], reverse=True)
+
+@contextmanager
+def timed(name):
+    """
+    Adds the time spent in the block to the ``name`` entry of the current
+    request profile. Nested blocks of the same name are only counted once.
+    Does nothing when profiling is off.
+    """
+    profile = _current.get()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+        profile.active.discard(name)
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection, recording the query in the profile
+    of the request being handled, if any.
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.record_query(execute, sql, params, many, context)
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+class ProfiledSerializerMixin:
+    """
+    Times to_representation() of a serializer under ``serialize``.
+    """
+
+    def to_representation(self, instance):
+        if _current.get() is None:
+            return super().to_representation(instance)
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+class ProfilingMiddleware:
+    """
+    Records the queries and the timed() sections of each request, returns
+    them in a Server-Timing header and logs the requests slower than
+    COMCOL_SLOW_REQUEST_MS with their query fingerprints.
+
+    Only installed when COMCOL_PROFILING is set, so that it costs nothing
+    otherwise. Sections can overlap: a query run while serializing counts in
+    both ``db`` and ``serialize``.
+
+    Works in both the sync and the async chains, so that the async views
+    (COMCOL_ASGI) stay async. The profile follows the request through its
+    context: queries and sections run by sync_to_async() threads count,
+    those of threads the view starts itself (e.g. the batch upload
+    executor) do not.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMCOL_PROFILING', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'COMCOL_SLOW_REQUEST_MS', 500)
+        # Each thread has its own connections: record on all of them
+        connection_created.connect(install_query_recorder)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_query_recorder(connection)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        # On the connection of the thread running the async ORM, which may
+        # have been opened before the signal was connected
+        await sync_to_async(install_query_recorder)(connection)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.start
+        response['Server-Timing'] = profile.server_timing(total)
+
+        if total * 1000 >= self.slow_request_ms:
+            slow_request_logger.warning(json.dumps({
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'ms': round(total * 1000, 1),
+                'db_ms': round(sum(duration for _, duration in profile.queries) * 1000, 1),
+                'queries': len(profile.queries),
+                'timings_ms': {name: round(seconds * 1000, 1) for name, seconds in profile.timings.items()},
+                'fingerprints': profile.fingerprints(),
+            }))
+        return response
@@ -0,0 +1,98 @@
+"""
+Compact renderers of the computer list, for clients fetching the whole
+catalogue over slow links. Both send the list column by column: every key
+once instead of once per row, the pictures of all computers in a single
+table, and the shared prefix of the picture URLs once:
+
+    {
+      "media_prefix": "/computers/media/computer_pictures/",
+      "computers": {"columns": ["id", "name", ...], "rows": [[1, "Apple II", ...], ...]},
+      "pictures": {"columns": ["id", "image", ..., "computer"], "rows": [...],
+                   "prefixed": ["image", "thumb", ...]}
+    }
+
+Values of the ``prefixed`` columns lost ``media_prefix``, except nulls.
+``pictures`` is only there when the computers had pictures, which are
+listed in their order and whose ``computer`` column gives the computer
+they belong to. A page keeps its ``next`` and ``previous`` links. Anything
+else than a list (a detail, an error) is rendered unchanged.
+
+``?format=columns`` selects the JSON variant, ``?format=msgpack`` the
+MessagePack one when the msgpack package is installed.
+"""
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from .blobs import PICTURES_DIR
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def media_prefix():
+    return f"{settings.MEDIA_URL.rstrip('/')}/{PICTURES_DIR}/"
+
+def column_table(items, prefix):
+    columns = list(dict.fromkeys(name for item in items for name in item))
+    rows = [[item.get(name) for name in columns] for item in items]
+    # Columns whose values are all picture URLs (or null)
+    prefixed = [
+        index for index, name in enumerate(columns)
+        if any(row[index] is not None for row in rows)
+        and all(row[index] is None or (isinstance(row[index], str) and row[index].startswith(prefix)) for row in rows)
+    ]
+    for row in rows:
+        for index in prefixed:
+            if row[index] is not None:
+                row[index] = row[index][len(prefix):]
+    table = {'columns': columns, 'rows': rows}
+    if prefixed:
+        table['prefixed'] = [columns[index] for index in prefixed]
+    return table
+
+def columnar(data):
+    """
+    The column-oriented form of a computer list or page of one, see above.
+    Other data is returned as it is.
+    """
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return {**{key: value for key, value in data.items() if key != 'results'}, **columnar(data['results'])}
+    if not isinstance(data, list):
+        return data
+    prefix = media_prefix()
+    computers = []
+    pictures = []
+    with_pictures = False
+    for item in data:
+        if 'pictures' in item:
+            with_pictures = True
+            item = dict(item)
+            for picture in item.pop('pictures'):
+                pictures.append(picture if 'computer' in picture else {**picture, 'computer': item['id']})
+        computers.append(item)
+    result = {'media_prefix': prefix, 'computers': column_table(computers, prefix)}
+    if with_pictures:
+        result['pictures'] = column_table(pictures, prefix)
+    return result
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.comcol.columns+json'
+    format = 'columns'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # default=str: like JSONRenderer, dates and decimals become strings
+        return msgpack.packb(columnar(data), use_bin_type=True, default=str)
+
+# Offered by the computer endpoints next to the default renderers
+COMPACT_RENDERERS = [ColumnarJSONRenderer] + ([MessagePackRenderer] if msgpack is not None else [])
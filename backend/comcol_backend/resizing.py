@@ -0,0 +1,231 @@
+"""
+Pictures resized on demand, for clients that ask for the pixel size they
+render (rounded up to COMCOL_RESIZE_STEP) instead of the fixed square
+variants.
+
+``/computers/resized/<unique_id>-<w>x<h>-<fit>.<fmt>`` is rendered from the
+original on the first request and stored in a disk cache laid out as
+``<COMCOL_RESIZE_CACHE_DIR>/<unique_id>/<w>x<h>-<fit>.<fmt>``, where nginx
+serves the next requests from without going through Django. The cache is
+kept under COMCOL_RESIZE_CACHE_BYTES by evicting the least recently used
+files.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from .image_pipeline import RESIZE_FITS, RESIZE_FORMATS
+
+logger = logging.getLogger(__name__)
+
+RESIZED_NAME = re.compile(
+    r'^(?P<unique_id>[0-9a-f-]{36})-(?P<width>[1-9]\d{0,4})x(?P<height>[1-9]\d{0,4})'
+    rf'-(?P<fit>{"|".join(RESIZE_FITS)})\.(?P<fmt>{"|".join(RESIZE_FORMATS)})$'
+)
+
+LOCKS_DIR = '.locks'
+# Per-key locks are striped over this many lock files
+LOCK_STRIPES = 256
+# Eviction goes down to this fraction of the budget, so that it does not
+# run again on the next write
+LOW_WATERMARK = 0.9
+
+def parse_resized_name(name):
+    """
+    Returns ``(unique_id, width, height, fit, fmt)`` for a resized picture
+    name, or None when the name is not one.
+    """
+    match = RESIZED_NAME.match(name)
+    if match is None:
+        return None
+    return (match['unique_id'], int(match['width']), int(match['height']), match['fit'], match['fmt'])
+
+def resize_allowed(width, height):
+    """
+    Whether pictures are rendered at ``width`` x ``height``: multiples of
+    COMCOL_RESIZE_STEP up to COMCOL_RESIZE_MAX_SIZE, which bounds the number
+    of renderings clients can have the server make of each picture.
+    """
+    step = getattr(settings, 'COMCOL_RESIZE_STEP', 50)
+    max_size = getattr(settings, 'COMCOL_RESIZE_MAX_SIZE', 2000)
+    return all(size <= max_size and size % step == 0 for size in (width, height))
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """
+    Exclusive flock() on ``path``, held by one thread of one process at a
+    time. Yields whether the lock was taken (always True when blocking).
+    """
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class ResizeCache:
+    """
+    Disk cache of the resized pictures, shared by the worker processes.
+
+    Concurrent misses on the same key wait on a file lock, so that only the
+    first one renders and the others read its result. Each process keeps
+    an estimate of the cache size from a scan plus its own writes, and
+    evicts by last use (the later of access and modification time) when the
+    estimate goes over ``budget_bytes``. Hits served by nginx update the
+    access time, with the daily granularity of ``relatime`` mounts.
+    """
+
+    def __init__(self, root, budget_bytes):
+        self.root = str(root)
+        self.budget_bytes = budget_bytes
+        self.estimate = None
+        self.lock = threading.Lock()
+
+    def path(self, unique_id, width, height, fit, fmt):
+        return os.path.join(self.root, unique_id, f'{width}x{height}-{fit}.{fmt}')
+
+    def lock_path(self, key):
+        stripe = int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) % LOCK_STRIPES
+        return os.path.join(self.root, LOCKS_DIR, f'{stripe:03d}.lock')
+
+    def open_or_render(self, unique_id, width, height, fit, fmt, render):
+        """
+        Returns the cached picture opened for reading, calling
+        ``render(path)`` to write it at ``path`` on a miss. An open file
+        stays readable even if eviction deletes it meanwhile.
+        """
+        path = self.path(unique_id, width, height, fit, fmt)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted since it was opened: rendered again below
+                f.close()
+            else:
+                return f
+        os.makedirs(os.path.join(self.root, LOCKS_DIR), exist_ok=True)
+        with file_lock(self.lock_path(path)):
+            try:
+                # Rendered by another request while this one waited
+                return open(path, 'rb')
+            except FileNotFoundError:
+                pass
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+            try:
+                render(temporary)
+                os.replace(temporary, path)
+            finally:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+            f = open(path, 'rb')
+        self.added(os.fstat(f.fileno()).st_size)
+        return f
+
+    def added(self, nbytes):
+        with self.lock:
+            if self.estimate is None:
+                self.estimate = self.scan()[1]
+            else:
+                self.estimate += nbytes
+            over_budget = self.estimate > self.budget_bytes
+        if over_budget:
+            self.evict()
+
+    def scan(self):
+        """
+        Returns the ``(last use, size, path)`` of every cached file and
+        their total size.
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.root):
+            return entries, total
+        with os.scandir(self.root) as directories:
+            for directory in directories:
+                if directory.name == LOCKS_DIR or not directory.is_dir(follow_symlinks=False):
+                    continue
+                with os.scandir(directory.path) as files:
+                    for entry in files:
+                        if entry.name.endswith('.tmp'):
+                            continue
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue
+                        entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+                        total += stat.st_size
+        return entries, total
+
+    def evict(self, target_bytes=None):
+        """
+        Deletes the least recently used files until the cache holds at most
+        ``target_bytes`` (LOW_WATERMARK of the budget by default). Returns
+        the number of files and bytes deleted; does nothing while another
+        process is evicting.
+        """
+        if target_bytes is None:
+            target_bytes = int(self.budget_bytes * LOW_WATERMARK)
+        os.makedirs(os.path.join(self.root, LOCKS_DIR), exist_ok=True)
+        with file_lock(os.path.join(self.root, LOCKS_DIR, 'evict.lock'), blocking=False) as locked:
+            if not locked:
+                return 0, 0
+            start = time.perf_counter()
+            entries, total = self.scan()
+            deleted = freed = 0
+            for _, size, path in sorted(entries):
+                if total <= target_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                freed += size
+                deleted += 1
+            with self.lock:
+                self.estimate = total
+        if deleted:
+            logger.info("Evicted %d resized picture(s), %d bytes, in %.0f ms",
+                        deleted, freed, (time.perf_counter() - start) * 1000)
+        return deleted, freed
+
+    def remove_picture(self, unique_id):
+        shutil.rmtree(os.path.join(self.root, unique_id), ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if name != LOCKS_DIR:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        with self.lock:
+            self.estimate = 0
+
+_resize_cache = None
+
+def get_resize_cache():
+    """
+    Returns the ResizeCache of COMCOL_RESIZE_CACHE_DIR, or None when
+    resizing on demand is disabled.
+    """
+    global _resize_cache
+    root = getattr(settings, 'COMCOL_RESIZE_CACHE_DIR', None)
+    if root is None:
+        return None
+    if _resize_cache is None or _resize_cache.root != str(root):
+        _resize_cache = ResizeCache(root, getattr(settings, 'COMCOL_RESIZE_CACHE_BYTES', 512 * 1024 * 1024))
+    return _resize_cache
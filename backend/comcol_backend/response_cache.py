@@ -0,0 +1,217 @@
+import gzip
+import hashlib
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings of the cached bodies, preferred first
+ENCODINGS = (['br'] if brotli is not None else []) + ['gzip']
+# Smaller bodies are sent as they are
+COMPRESS_MIN_BYTES = 1024
+# Quality 11 only saves another tenth on the full list, for 50 times the
+# time (seconds per data version)
+BROTLI_QUALITY = 9
+# Formats whose responses are cached (not the browsable API)
+CACHED_FORMATS = ('json', 'columns', 'msgpack')
+
+def accepted_encoding(request):
+    """
+    The content coding of ENCODINGS that the Accept-Encoding header of the
+    request prefers, or None when it accepts none of them.
+    """
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = quality
+    candidates = [
+        (accepted.get(encoding, accepted.get('*', 0.0)), -index, encoding)
+        for index, encoding in enumerate(ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical content
+    return gzip.compress(content, 9, mtime=0)
+
+class ResponseCache:
+    """
+    Stores rendered JSON responses in a Django cache, so that every worker
+    sharing the backend (e.g. FileBasedCache) benefits from them. Size
+    bounding and eviction are those of the backend (MAX_ENTRIES).
+
+    The keys contain the collection version and its time, read from the
+    database, so a write made by any process makes all of the entries
+    unreachable at once and leaves them to be evicted. The time keeps a
+    database restored to an older version from finding the entries of the
+    writes made after it; the database name keeps databases sharing the
+    backend (e.g. the one of the tests) apart.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    @property
+    def prefix(self):
+        name = str(connection.settings_dict['NAME'])
+        if name.startswith('file:'):
+            # The URI of a read-only connection names the same file
+            name = name[len('file:'):].partition('?')[0]
+        database = hashlib.sha1(name.encode()).hexdigest()[:8]
+        return f'comcol:resp:{database}'
+
+    def key(self, request, format='json'):
+        from .conditional import collection_state
+        version, updated_at = collection_state(request)
+        stamp = updated_at.timestamp() if updated_at is not None else 0
+        digest = hashlib.sha1(f'{request.get_full_path()}\n{format}'.encode()).hexdigest()
+        return f'{self.prefix}:{version}:{stamp}:{digest}'
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        self.count('hits' if entry is not None else 'misses')
+        return entry
+
+    def set(self, key, content_type, content):
+        self.cache.set(key, (content_type, content))
+
+    def encode(self, key, request, response, content):
+        """
+        Sends the ``content`` of ``response`` compressed in the coding the
+        request accepts, when it is worth it. Each coding of an entry is
+        compressed once and cached along with it, so it goes with the same
+        invalidation.
+        """
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = accepted_encoding(request)
+        if encoding is None or len(content) < COMPRESS_MIN_BYTES:
+            return response
+        encoded_key = f'{key}:{encoding}'
+        body = self.cache.get(encoded_key)
+        if body is None:
+            body = compress(content, encoding)
+            self.cache.set(encoded_key, body)
+        response.content = body
+        response['Content-Encoding'] = encoding
+        return response
+
+    def count(self, counter):
+        key = f'{self.prefix}:stats:{counter}'
+        self.cache.add(key, 0, timeout=None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            pass
+
+    def stats(self):
+        hits = self.cache.get(f'{self.prefix}:stats:hits', 0)
+        misses = self.cache.get(f'{self.prefix}:stats:misses', 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total else None,
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many([f'{self.prefix}:stats:hits', f'{self.prefix}:stats:misses'])
+
+    def clear(self):
+        self.cache.clear()
+
+_response_cache = None
+
+def get_response_cache():
+    """
+    Returns the ResponseCache configured by the COMCOL_RESPONSE_CACHE setting
+    (a CACHES alias), or None when response caching is disabled.
+    """
+    global _response_cache
+    alias = getattr(settings, 'COMCOL_RESPONSE_CACHE', None)
+    if alias is None:
+        return None
+    if _response_cache is None or _response_cache.cache is not caches[alias]:
+        _response_cache = ResponseCache(alias)
+    return _response_cache
+
+def cache_response(method):
+    """
+    Caches the rendered body of a viewset GET method. Only responses with
+    status 200 in CACHED_FORMATS are stored; they are sent compressed when
+    the client accepts it.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        response_cache = get_response_cache()
+        format = request.accepted_renderer.format
+        if response_cache is None or format not in CACHED_FORMATS:
+            return method(self, request, *args, **kwargs)
+
+        key = response_cache.key(request, format)
+        entry = response_cache.get(key)
+        if entry is not None:
+            content_type, content = entry
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response_cache.encode(key, request, response, content)
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            def store(rendered):
+                response_cache.set(key, rendered['Content-Type'], rendered.content)
+                response_cache.encode(key, request, rendered, rendered.content)
+            response.add_post_render_callback(store)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+def async_cache_response(view_func):
+    """
+    cache_response for async views that return rendered JSON responses. The
+    cache backends are synchronous, so they are called from a thread.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        response_cache = get_response_cache()
+        if response_cache is None:
+            return await view_func(request, *args, **kwargs)
+
+        key = await sync_to_async(response_cache.key, thread_sensitive=False)(request)
+        entry = await sync_to_async(response_cache.get, thread_sensitive=False)(key)
+        if entry is not None:
+            content_type, content = entry
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return await sync_to_async(response_cache.encode, thread_sensitive=False)(
+                key, request, response, content)
+
+        response = await view_func(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        if response.status_code == 200:
+            await sync_to_async(response_cache.set, thread_sensitive=False)(
+                key, response['Content-Type'], response.content)
+            response = await sync_to_async(response_cache.encode, thread_sensitive=False)(
+                key, request, response, response.content)
+        return response
+    return wrapper
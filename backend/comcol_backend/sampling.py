@@ -0,0 +1,40 @@
+import random
+import threading
+from .models import Computer, Picture
+
+class SampleIndex:
+    """
+    In-memory list of computer ids, with and without pictures, used to draw
+    random computers without ``ORDER BY RANDOM()`` over the whole table.
+
+    The index is tagged with the collection version it was built from and
+    rebuilt when the version moves, so every gunicorn worker notices the
+    writes made through the others.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.all_ids = []
+        self.ids_with_pictures = []
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        with self.lock:
+            if self.version != version:
+                self.all_ids = list(Computer.objects.order_by('id').values_list('id', flat=True))
+                self.ids_with_pictures = list(
+                    Picture.objects.order_by('computer_id').values_list('computer_id', flat=True).distinct()
+                )
+                self.version = version
+            return self.all_ids, self.ids_with_pictures
+
+_sample_index = SampleIndex()
+
+def sample_computer_ids(n, with_pictures, version):
+    """
+    Returns up to ``n`` distinct random computer ids, only among computers
+    that have pictures when ``with_pictures`` is set.
+    """
+    all_ids, ids_with_pictures = _sample_index.get(version)
+    ids = ids_with_pictures if with_pictures else all_ids
+    return random.sample(ids, min(n, len(ids)))
@@ -1,9 +1,22 @@
 from rest_framework import serializers
 from .models import Computer, Picture
 from django.conf import settings
-import os
+from django.db import models
+from django.utils.encoding import filepath_to_uri
+from .profiling import ProfiledSerializerMixin, timed
 
-class PictureSerializer(serializers.ModelSerializer):
+def media_url(path):
+    # Build URL using Django's MEDIA_URL setting
+    media_url = settings.MEDIA_URL.rstrip('/')
+
+    # Remove any leading slash from path
+    if path.startswith('/'):
+        path = path[1:]
+
+    # Construct full URL: MEDIA_URL + path
+    return f"{media_url}/{path}"
+
+class PictureSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     thumb = serializers.SerializerMethodField()
     gallery = serializers.SerializerMethodField()
     portrait = serializers.SerializerMethodField()
@@ -11,48 +24,202 @@ class PictureSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Picture
-        fields = '__all__'
+        exclude = ['variants', 'blob']
 
     def get_full_url(self, path):
-        # Build URL using Django's MEDIA_URL setting
-        media_url = settings.MEDIA_URL.rstrip('/')
-        
-        # Remove any leading slash from path
-        if path.startswith('/'):
-            path = path[1:]
-        
-        # Construct full URL: MEDIA_URL + path
-        return f"{media_url}/{path}"
+        return media_url(path)
+
+    def get_variant_url(self, obj, suffix):
+        # The relative paths are stored on the picture once the variants
+        # have been generated; pending pictures have an empty manifest.
+        path = obj.variants.get(suffix)
+        return self.get_full_url(path) if path else None
 
     def get_thumb(self, obj):
-        if obj.image:
-            base, ext = os.path.splitext(obj.image.name)
-            rel_path = f"{base}-thumb{ext}"
-            return self.get_full_url(rel_path)
-        return None
+        return self.get_variant_url(obj, 'thumb')
 
     def get_gallery(self, obj):
-        if obj.image:
-            base, ext = os.path.splitext(obj.image.name)
-            rel_path = f"{base}-gallery{ext}"
-            return self.get_full_url(rel_path)
-        return None
+        return self.get_variant_url(obj, 'gallery')
 
     def get_portrait(self, obj):
-        if obj.image:
-            base, ext = os.path.splitext(obj.image.name)
-            rel_path = f"{base}-portrait{ext}"
-            return self.get_full_url(rel_path)
-        return None
+        return self.get_variant_url(obj, 'portrait')
 
     def get_image(self, obj):
         # obj.image.url already includes the MEDIA_URL prefix (e.g., /computers/media/...)
         # So we return it directly without calling get_full_url
         return obj.image.url
 
-class ComputerSerializer(serializers.ModelSerializer):
+# Fields that are only sent when explicitly asked for with ``fields=`` or
+# ``expand=``. ``thumb`` is the thumbnail URL of the first picture.
+EXPANDABLE_FIELDS = ('pictures', 'thumb')
+
+def parse_field_selection(query_params):
+    """
+    Returns the set of computer fields requested with the ``fields=`` and
+    ``expand=`` query parameters, or None when the client wants the full
+    representation. Raises ValidationError listing the unknown names.
+
+    ``fields=id,name,maker,year`` restricts the output to those fields and
+    ``expand=thumb`` adds the first picture thumbnail without sending every
+    picture variant.
+    """
+    fields = query_params.get('fields')
+    expand = query_params.get('expand')
+    if fields is None and expand is None:
+        return None
+    known = {field.name for field in Computer._meta.concrete_fields}.union(EXPANDABLE_FIELDS)
+    errors = {}
+    selection = set(ComputerSerializer.Meta.default_fields) if fields is None else set()
+    for param, value in (('fields', fields), ('expand', expand)):
+        names = [name.strip() for name in (value or '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            errors[param] = [f"Unknown field(s): {', '.join(unknown)}"]
+        selection.update(names)
+    if errors:
+        raise serializers.ValidationError(errors)
+    return selection
+
+class ComputerSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     pictures = PictureSerializer(many=True, read_only=True)
+    thumb = serializers.SerializerMethodField()
 
     class Meta:
         model = Computer
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        default_fields = ('id', 'pictures', 'name', 'maker', 'year', 'description', 'url', 'favorite')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selection = self.context.get('field_selection')
+        if selection is None:
+            selection = self.Meta.default_fields
+        for name in list(self.fields):
+            if name not in selection:
+                self.fields.pop(name)
+
+    def get_thumb(self, obj):
+        # The view annotates the variants of the first picture so that list
+        # requests do not have to prefetch every picture for the thumbnail.
+        if hasattr(obj, 'first_variants'):
+            variants = obj.first_variants or {}
+        else:
+            first = min(obj.pictures.all(), key=lambda picture: picture.order, default=None)
+            variants = first.variants if first else {}
+        path = variants.get('thumb')
+        return media_url(path) if path else None
+
+def first_picture_variants():
+    """
+    Subquery returning the variant manifest of the first picture of each
+    computer, for the ``thumb`` field.
+    """
+    first_picture = Picture.objects.filter(computer=models.OuterRef('pk')).order_by('order')
+    return models.Subquery(first_picture.values('variants')[:1], output_field=models.JSONField())
+
+def first_picture_image():
+    """
+    Subquery returning the original image path of the first picture of each
+    computer.
+    """
+    first_picture = Picture.objects.filter(computer=models.OuterRef('pk')).order_by('order')
+    return models.Subquery(first_picture.values('image')[:1])
+
+def picture_list_rows(pictures):
+    """
+    The ``values()`` rows of ``pictures`` expected by serialize_computer_list.
+    """
+    return pictures.order_by('order').values(*PICTURE_LIST_COLUMNS)
+
+@timed('serialize')
+def serialize_computer_list(computer_rows, selection=None, picture_rows=None):
+    """
+    Read-only fast path for list responses, producing the same dicts as
+    ComputerSerializer(many=True) from ``values()`` rows.
+
+    ``computer_rows`` must contain the selected columns, plus
+    ``first_variants`` when ``thumb`` is selected. ``picture_rows`` are the
+    picture_list_rows() of those computers, only needed (and only iterated)
+    when ``pictures`` is selected.
+    """
+    if selection is None:
+        selection = ComputerSerializer.Meta.default_fields
+    field_order = [name for name in ('id', 'pictures', 'thumb', 'name', 'maker', 'year', 'description', 'url', 'favorite')
+                   if name in selection]
+    prefix = settings.MEDIA_URL.rstrip('/') + '/'
+
+    pictures_by_computer = {}
+    if 'pictures' in selection:
+        # Same result as storage.url(), without a call per picture
+        image_prefix = Picture._meta.get_field('image').storage.base_url
+        for row in picture_rows:
+            variants = row['variants']
+            thumb, gallery, portrait = variants.get('thumb'), variants.get('gallery'), variants.get('portrait')
+            name = row['image']
+            pictures_by_computer.setdefault(row['computer'], []).append({
+                'id': row['id'],
+                'thumb': prefix + thumb.lstrip('/') if thumb else None,
+                'gallery': prefix + gallery.lstrip('/') if gallery else None,
+                'portrait': prefix + portrait.lstrip('/') if portrait else None,
+                'image': image_prefix + filepath_to_uri(name).lstrip('/') if name else None,
+                'order': row['order'],
+                'unique_id': row['unique_id'],
+                'extension': row['extension'],
+                'variants_status': row['variants_status'],
+                'width': row['width'],
+                'height': row['height'],
+                'dominant_color': row['dominant_color'],
+                'placeholder': row['placeholder'],
+                'computer': row['computer'],
+            })
+
+    data = []
+    for row in computer_rows:
+        item = {}
+        for name in field_order:
+            if name == 'pictures':
+                item['pictures'] = pictures_by_computer.get(row['id'], [])
+            elif name == 'thumb':
+                thumb = (row['first_variants'] or {}).get('thumb')
+                item['thumb'] = prefix + thumb.lstrip('/') if thumb else None
+            else:
+                item[name] = row[name]
+        data.append(item)
+    return data
+
+PICTURE_LIST_COLUMNS = (
+    'id', 'computer', 'image', 'order', 'unique_id', 'extension', 'variants_status', 'variants',
+    'width', 'height', 'dominant_color', 'placeholder',
+)
+
+# Fields of the compact representation used by the games
+SAMPLE_COLUMNS = ('id', 'name', 'maker', 'year')
+
+def serialize_sample(computer_ids, computer_rows):
+    """
+    Compact representation of the computers of ``computer_ids``, in that
+    order, with the URLs of their first picture only. ``computer_rows`` are
+    ``values()`` rows with SAMPLE_COLUMNS plus the ``first_variants`` and
+    ``first_image`` annotations.
+    """
+    prefix = settings.MEDIA_URL.rstrip('/') + '/'
+    image_prefix = Picture._meta.get_field('image').storage.base_url
+    rows = {row['id']: row for row in computer_rows}
+    data = []
+    for computer_id in computer_ids:
+        row = rows.get(computer_id)
+        if row is None:
+            # Deleted since the ids were drawn
+            continue
+        item = {name: row[name] for name in SAMPLE_COLUMNS}
+        if row['first_image']:
+            variants = row['first_variants'] or {}
+            item['picture'] = {
+                suffix: prefix + variants[suffix].lstrip('/') if variants.get(suffix) else None
+                for suffix in ('thumb', 'gallery', 'portrait')
+            }
+            item['picture']['image'] = image_prefix + filepath_to_uri(row['first_image']).lstrip('/')
+        else:
+            item['picture'] = None
+        data.append(item)
+    return data
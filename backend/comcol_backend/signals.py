@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .blobs import release_blob
+from .models import CollectionVersion, Computer, Picture
+from .resizing import get_resize_cache
+
+# Sent after any write to the collection, with ``computer_ids`` listing the
+# computers whose representation changed. Model saves and deletes send it
+# automatically; code writing with update()/bulk_update()/bulk_create() must
+# send it itself.
+collection_changed = Signal()
+
+@receiver(post_save, sender=Computer)
+@receiver(post_delete, sender=Computer)
+def computer_changed(sender, instance, **kwargs):
+    collection_changed.send(sender=sender, computer_ids=[instance.pk])
+
+@receiver(post_save, sender=Picture)
+@receiver(post_delete, sender=Picture)
+def picture_changed(sender, instance, **kwargs):
+    collection_changed.send(sender=sender, computer_ids=[instance.computer_id])
+
+@receiver(post_delete, sender=Picture)
+def picture_deleted(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_blob(instance)
+    resize_cache = get_resize_cache()
+    if resize_cache is not None:
+        transaction.on_commit(lambda: resize_cache.remove_picture(instance.unique_id))
+
+@receiver(collection_changed)
+def bump_collection_version(sender, **kwargs):
+    CollectionVersion.bump()
@@ -0,0 +1,49 @@
+import threading
+from django.db.models import Count
+from .models import Computer, Picture
+
+def compute_stats():
+    """
+    Counts of computers per maker, year and decade, and picture totals, from
+    a few GROUP BY queries answered by the Computer indexes.
+    """
+    makers = list(Computer.objects.order_by().values('maker').annotate(count=Count('id')).order_by('-count', 'maker'))
+    years = list(Computer.objects.order_by().values('year').annotate(count=Count('id')).order_by('year'))
+    decades = {}
+    for row in years:
+        if row['year'] is not None:
+            decade = row['year'] // 10 * 10
+            decades[decade] = decades.get(decade, 0) + row['count']
+    return {
+        'computers': sum(row['count'] for row in years),
+        'computers_with_pictures': Picture.objects.order_by().values('computer_id').distinct().count(),
+        'pictures': Picture.objects.count(),
+        'makers': [row for row in makers if row['maker']],
+        'without_maker': sum(row['count'] for row in makers if not row['maker']),
+        'years': [row for row in years if row['year'] is not None],
+        'decades': [{'decade': decade, 'count': count} for decade, count in sorted(decades.items())],
+        'without_year': sum(row['count'] for row in years if row['year'] is None),
+    }
+
+class CollectionStats:
+    """
+    compute_stats() of the collection, kept until the collection version
+    moves, like the sample index (see sampling.py).
+    """
+
+    def __init__(self):
+        self.version = None
+        self.stats = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        with self.lock:
+            if self.version != version:
+                self.stats = compute_stats()
+                self.version = version
+            return self.stats
+
+_collection_stats = CollectionStats()
+
+def collection_stats(version):
+    return _collection_stats.get(version)
@@ -0,0 +1,26 @@
+import copy
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with the file based caches in a temporary directory, away
+    from the ones of the development server.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        caches = copy.deepcopy(settings.CACHES)
+        for alias, cache in caches.items():
+            if cache['BACKEND'].endswith('FileBasedCache'):
+                cache['LOCATION'] = f'{self.cache_dir.name}/{alias}'
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        self.cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
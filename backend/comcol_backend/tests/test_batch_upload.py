@@ -0,0 +1,96 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from comcol_backend import uploads, views
+from comcol_backend.models import Computer, DerivativeJob, ImageBlob, Picture
+from comcol_backend.upload_budget import BudgetTimeout, UploadTooLarge
+
+def jpeg_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+class BatchUploadTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name, COMCOL_RESIZE_CACHE_DIR=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.computer = Computer.objects.create(name='Apple II')
+        Picture.objects.create(computer=self.computer, image='pictures/existing.jpeg', unique_id='existing', order=3)
+
+    def upload(self, files):
+        with mock.patch.dict(os.environ, {'COMCOL_WRITE': '1'}), self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/computers/api/upload-pictures/', {'computer': self.computer.pk, 'images': files})
+
+    def test_valid_and_invalid_files(self):
+        files = [jpeg_upload('red.jpeg', 'red'), jpeg_upload('green.jpeg', 'green'),
+                 SimpleUploadedFile('notes.jpeg', b'not an image', content_type='image/jpeg'),
+                 jpeg_upload('blue.jpeg', 'blue')]
+        with self.assertLogs('comcol_backend.views', 'ERROR'):
+            response = self.upload(files)
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([(result['file'], result['status']) for result in results],
+                         [('red.jpeg', 201), ('green.jpeg', 201), ('notes.jpeg', 400), ('blue.jpeg', 201)])
+        self.assertEqual(results[2]['error'], 'Not a valid image')
+        self.assertNotIn('picture', results[2])
+        # Added after the existing picture, in the order they were sent
+        self.assertEqual([result['picture']['order'] for result in results if result['status'] == 201], [4, 5, 6])
+        created = Picture.objects.filter(pk__in=[result['picture']['id'] for result in results if 'picture' in result])
+        self.assertEqual(created.count(), 3)
+        self.assertEqual(DerivativeJob.objects.filter(picture__in=created).count(), 3)
+        self.assertEqual(ImageBlob.objects.count(), 3)
+
+    def test_all_files_refused(self):
+        with self.assertLogs('comcol_backend.views', 'ERROR'):
+            response = self.upload([SimpleUploadedFile('a.jpeg', b'not an image', content_type='image/jpeg')])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['results'][0]['status'], 400)
+        self.assertEqual(Picture.objects.count(), 1)
+
+    def test_conversion_errors(self):
+        files = [SimpleUploadedFile(f'{name}.heic', name.encode(), content_type='image/heic')
+                 for name in ('large', 'busy', 'broken')]
+
+        def convert(uploaded_file):
+            uploaded_file.seek(0)
+            content = uploaded_file.read()
+            raise {b'large': UploadTooLarge, b'busy': BudgetTimeout, b'broken': ValueError}[content](content)
+
+        with mock.patch.object(uploads, 'convert_heic_upload', side_effect=convert), \
+                self.assertLogs('comcol_backend.views', 'ERROR'):
+            response = self.upload(files)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']], [413, 503, 400])
+        self.assertFalse(ImageBlob.objects.exists())
+
+    @override_settings(COMCOL_UPLOAD_MAX_CONCURRENT=2)
+    def test_concurrent_uploads_limited(self):
+        lock = threading.Lock()
+        running = [0]
+        most = [0]
+
+        def store_upload(uploaded_file):
+            with lock:
+                running[0] += 1
+                most[0] = max(most[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return store(uploaded_file)
+
+        store = views.store_upload
+        files = [jpeg_upload(f'{index}.jpeg', (index * 40, 0, 0)) for index in range(5)]
+        with mock.patch.object(views, 'store_upload', store_upload):
+            response = self.upload(files)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(most[0], 2)
@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from comcol_backend.blobs import acquire_blob, blob_name, get_storage, recount_blobs, release_blobs, store_blob
+from comcol_backend.models import Computer, ImageBlob, Picture
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+CONTENT = jpeg_bytes()
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+class BlobReferenceTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name, COMCOL_RESIZE_CACHE_DIR=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.computer = Computer.objects.create(name='Apple II')
+
+    def add_picture(self):
+        blob = acquire_blob(SHA256)
+        store_blob(SHA256, ContentFile(CONTENT))
+        return Picture.objects.create(
+            computer=self.computer, image=blob_name(SHA256), blob=blob, unique_id=str(uuid.uuid4()),
+        )
+
+    def stored(self):
+        return get_storage().exists(blob_name(SHA256))
+
+    def test_last_picture_deleted(self):
+        picture = self.add_picture()
+        with self.captureOnCommitCallbacks(execute=True):
+            picture.delete()
+        self.assertFalse(self.stored())
+        self.assertFalse(ImageBlob.objects.filter(sha256=SHA256).exists())
+
+    def test_upload_during_delete_keeps_original(self):
+        picture = self.add_picture()
+        with self.captureOnCommitCallbacks() as callbacks:
+            picture.delete()
+        # An upload of the same content takes its reference after the
+        # delete committed, before the files are deleted
+        self.assertTrue(self.stored())
+        acquire_blob(SHA256)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.stored())
+        self.assertEqual(ImageBlob.objects.get(sha256=SHA256).refcount, 1)
+
+    def test_released_upload_reference(self):
+        picture = self.add_picture()
+        acquire_blob(SHA256)
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blobs({SHA256: 1})
+        self.assertTrue(self.stored())
+        with self.captureOnCommitCallbacks(execute=True):
+            picture.delete()
+        self.assertFalse(self.stored())
+
+    def test_upload_racing_delete_of_last_picture(self):
+        picture = self.add_picture()
+        with self.captureOnCommitCallbacks() as callbacks:
+            picture.delete()
+        storage = get_storage()
+        exists = storage.exists
+
+        def exists_then_delete(name):
+            # The files of the deleted picture go right after the upload
+            # found them
+            found = exists(name)
+            for callback in callbacks:
+                callback()
+            return found
+
+        upload = SimpleUploadedFile('photo.jpeg', CONTENT, content_type='image/jpeg')
+        with mock.patch.dict(os.environ, {'COMCOL_WRITE': '1'}), \
+                mock.patch.object(storage, 'exists', side_effect=exists_then_delete):
+            response = self.client.post('/computers/api/upload-picture/', {'computer': self.computer.pk, 'image': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(self.stored())
+        self.assertEqual(ImageBlob.objects.get(sha256=SHA256).refcount, 1)
+
+    def test_batch_upload_releases_failed_files(self):
+        bad_heic = b'not a HEIC image'
+        files = [
+            SimpleUploadedFile('a.jpeg', CONTENT, content_type='image/jpeg'),
+            SimpleUploadedFile('b.jpeg', CONTENT, content_type='image/jpeg'),
+            SimpleUploadedFile('c.heic', bad_heic, content_type='image/heic'),
+        ]
+        with mock.patch.dict(os.environ, {'COMCOL_WRITE': '1'}), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/computers/api/upload-pictures/', {'computer': self.computer.pk, 'images': files})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.json()['results']], [201, 201, 400])
+        self.assertEqual(ImageBlob.objects.get(sha256=SHA256).refcount, 2)
+        self.assertFalse(ImageBlob.objects.filter(sha256=hashlib.sha256(bad_heic).hexdigest()).exists())
+        self.assertTrue(self.stored())
+
+    def test_upload_of_non_image_refused(self):
+        content = b'#!/bin/sh\necho not a picture\n'
+        upload = SimpleUploadedFile('photo.jpeg', content, content_type='image/jpeg')
+        with mock.patch.dict(os.environ, {'COMCOL_WRITE': '1'}), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/computers/api/upload-picture/', {'computer': self.computer.pk, 'image': upload})
+        self.assertEqual(response.status_code, 400)
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.assertFalse(ImageBlob.objects.filter(sha256=sha256).exists())
+        self.assertFalse(get_storage().exists(blob_name(sha256)))
+        self.assertFalse(Picture.objects.exists())
+
+    def test_recount_skips_uploads_in_flight(self):
+        picture = self.add_picture()
+        # Another upload of the same content, and one of new content, hold
+        # references before their pictures exist
+        acquire_blob(SHA256)
+        acquire_blob('f' * 64)
+        self.assertEqual(recount_blobs(), (0, 0))
+        self.assertEqual(ImageBlob.objects.get(sha256=SHA256).refcount, 2)
+        self.assertTrue(ImageBlob.objects.filter(sha256='f' * 64).exists())
+
+        # Once they are old, the references are drift
+        ImageBlob.objects.update(acquired_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(recount_blobs(dry_run=True), (2, 1))
+        self.assertEqual(recount_blobs(), (2, 1))
+        self.assertEqual(ImageBlob.objects.get(sha256=SHA256).refcount, 1)
+        self.assertFalse(ImageBlob.objects.filter(sha256='f' * 64).exists())
+        picture.refresh_from_db()
+        self.assertEqual(picture.blob.sha256, SHA256)
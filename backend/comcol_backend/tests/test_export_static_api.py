@@ -0,0 +1,60 @@
+import io
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from comcol_backend.models import Computer
+
+@override_settings(COMCOL_RESPONSE_CACHE=None)
+class ExportStaticApiTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.apple = Computer.objects.create(name='Apple II', maker='Apple', year=1977)
+        self.commodore = Computer.objects.create(name='Commodore 64', maker='Commodore', year=1982)
+
+    def export(self, *args):
+        output = io.StringIO()
+        call_command('export_static_api', f'--output-dir={self.root}', *args, stdout=output)
+        return output.getvalue()
+
+    def path(self, name):
+        return os.path.join(self.root, 'computers', 'api', name)
+
+    def snapshot(self):
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                files[os.path.relpath(path, self.root)] = os.stat(path).st_mtime_ns
+        return files
+
+    def test_export(self):
+        self.assertIn(': 6 written, 0 removed', self.export())
+        with open(self.path(f'computers/{self.apple.pk}/index.json')) as f:
+            self.assertEqual(json.load(f)['name'], 'Apple II')
+        self.assertTrue(os.path.exists(self.path('computers/index.columns.gz')))
+
+    def test_unchanged_collection_writes_nothing(self):
+        self.export()
+        before = self.snapshot()
+        self.assertIn('is up to date', self.export())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_changes_written(self):
+        self.export()
+        self.apple.name = 'Apple IIe'
+        self.apple.save()
+        self.commodore.delete()
+        self.assertIn(': 4 written, 1 removed', self.export())
+        with open(self.path(f'computers/{self.apple.pk}/index.json')) as f:
+            self.assertEqual(json.load(f)['name'], 'Apple IIe')
+        self.assertFalse(os.path.exists(self.path(f'computers/{self.commodore.pk}/index.json')))
+        self.assertFalse(os.path.exists(self.path(f'computers/{self.commodore.pk}')))
+
+    def test_force(self):
+        self.export()
+        self.assertIn(': 6 written, 0 removed', self.export('--force'))
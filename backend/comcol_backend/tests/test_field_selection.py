@@ -0,0 +1,52 @@
+from django.test import TestCase, override_settings
+from django.urls import path
+from comcol_backend import async_views
+from comcol_backend.models import Computer, Picture
+
+# The async views, routed in place of the DRF ones like under COMCOL_ASGI
+urlpatterns = [
+    path('computers/api/computers/', async_views.computer_list),
+    path('computers/api/computers/<int:pk>/', async_views.computer_detail),
+]
+
+@override_settings(COMCOL_RESPONSE_CACHE=None)
+class FieldSelectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.computer = Computer.objects.create(name='Apple II', maker='Apple', year=1977)
+        Picture.objects.create(computer=cls.computer, image='pictures/a.jpeg', unique_id='a', order=1,
+                               variants={'thumb': 'pictures/a_thumb.jpeg'})
+        Picture.objects.create(computer=cls.computer, image='pictures/b.jpeg', unique_id='b', order=0,
+                               variants={'thumb': 'pictures/b_thumb.jpeg'})
+
+    def get(self, url, **params):
+        return self.client.get(url, params, HTTP_ACCEPT='application/json')
+
+    def test_fields(self):
+        response = self.get('/computers/api/computers/', fields='id,name')
+        self.assertEqual(response.json(), [{'id': self.computer.pk, 'name': 'Apple II'}])
+        response = self.get(f'/computers/api/computers/{self.computer.pk}/', fields='name,year')
+        self.assertEqual(response.json(), {'name': 'Apple II', 'year': 1977})
+
+    def test_expand_thumb(self):
+        item, = self.get('/computers/api/computers/', expand='thumb').json()
+        self.assertEqual(item['thumb'], '/media/pictures/b_thumb.jpeg')
+        self.assertEqual(item['name'], 'Apple II')
+        self.assertEqual(len(item['pictures']), 2)
+        item, = self.get('/computers/api/computers/', fields='id', expand='thumb').json()
+        self.assertEqual(set(item), {'id', 'thumb'})
+
+    def test_unknown_fields(self):
+        response = self.get('/computers/api/computers/', fields='id,nmae,colour', expand='thumb,specs')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'fields': ['Unknown field(s): nmae, colour'],
+            'expand': ['Unknown field(s): specs'],
+        })
+        response = self.get(f'/computers/api/computers/{self.computer.pk}/', fields='nmae')
+        self.assertEqual(response.status_code, 400)
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncFieldSelectionTests(FieldSelectionTests):
+    """The same requests answered by the async views."""
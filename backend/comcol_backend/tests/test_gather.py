@@ -0,0 +1,143 @@
+import io
+import os
+import tempfile
+import threading
+from contextlib import redirect_stderr
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import SimpleTestCase
+from comcol_backend.gather import PageCache, extract_text, fetch_page, gather_batch, make_session
+
+PAGE = b'<html><head><script>var x = 1;</script></head><body>\n<h1>Apple II</h1>\n<p>Released in 1977</p>\n</body></html>'
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves the pages of ``server.pages``: ``{path: (status, headers, body)}``,
+    or a list of them answered in turn. Conditional requests matching the
+    ETag or Last-Modified of a 200 page get a 304.
+    """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            page = server.pages.get(self.path, (404, {}, b'Not found'))
+            if isinstance(page, list):
+                page = page.pop(0) if len(page) > 1 else page[0]
+        status, headers, body = page
+        if status == 200 and (
+            ('ETag' in headers and self.headers.get('If-None-Match') == headers['ETag'])
+            or ('Last-Modified' in headers and self.headers.get('If-Modified-Since') == headers['Last-Modified'])
+        ):
+            status, body = 304, b''
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class GatherTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.pages = {}
+        self.server.requests = []
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = PageCache(os.path.join(self.directory, 'pages'))
+        self.session = make_session(4)
+        self.addCleanup(self.session.close)
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def requests_to(self, path):
+        return [headers for request_path, headers in self.server.requests if request_path == path]
+
+    def test_extract_text(self):
+        self.assertEqual(extract_text(PAGE.decode()), 'Apple II\nReleased in 1977')
+        # Kept by get_text() too
+        self.assertEqual(extract_text('<noscript><p>Enable JavaScript</p></noscript>'), 'Enable JavaScript')
+
+    def test_revalidates_with_etag(self):
+        self.server.pages['/page'] = (200, {'ETag': '"v1"'}, PAGE)
+        first = fetch_page(self.session, self.cache, self.url('/page'))
+        second = fetch_page(self.session, self.cache, self.url('/page'))
+        self.assertEqual(first, PAGE.decode())
+        self.assertEqual(second, first)
+        requests = self.requests_to('/page')
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn('If-None-Match', requests[0])
+        self.assertEqual(requests[1]['If-None-Match'], '"v1"')
+
+    def test_not_modified_keeps_body(self):
+        self.server.pages['/page'] = (200, {'ETag': '"v1"'}, PAGE)
+        fetch_page(self.session, self.cache, self.url('/page'))
+        body_path, meta_path = self.cache.paths(self.url('/page'))
+        body_before, meta_before = os.stat(body_path), self.cache.get(self.url('/page'))[0]
+        fetch_page(self.session, self.cache, self.url('/page'))
+        body_after, meta_after = os.stat(body_path), self.cache.get(self.url('/page'))[0]
+        self.assertEqual((body_after.st_ino, body_after.st_mtime_ns), (body_before.st_ino, body_before.st_mtime_ns))
+        self.assertGreater(meta_after['fetched_at'], meta_before['fetched_at'])
+        self.assertEqual(meta_after['etag'], '"v1"')
+
+    def test_revalidates_with_last_modified(self):
+        last_modified = 'Mon, 01 Jan 2024 00:00:00 GMT'
+        self.server.pages['/page'] = (200, {'Last-Modified': last_modified}, PAGE)
+        fetch_page(self.session, self.cache, self.url('/page'))
+        self.assertEqual(fetch_page(self.session, self.cache, self.url('/page')), PAGE.decode())
+        self.assertEqual(self.requests_to('/page')[1]['If-Modified-Since'], last_modified)
+
+    def test_changed_page_replaces_cache_entry(self):
+        self.server.pages['/page'] = [(200, {'ETag': '"v1"'}, PAGE), (200, {'ETag': '"v2"'}, b'<p>Apple IIe</p>')]
+        fetch_page(self.session, self.cache, self.url('/page'))
+        self.assertEqual(fetch_page(self.session, self.cache, self.url('/page')), '<p>Apple IIe</p>')
+        meta, body = self.cache.get(self.url('/page'))
+        self.assertEqual(meta['etag'], '"v2"')
+        self.assertEqual(body, b'<p>Apple IIe</p>')
+
+    def test_max_age_skips_request(self):
+        self.server.pages['/page'] = (200, {'ETag': '"v1"'}, PAGE)
+        fetch_page(self.session, self.cache, self.url('/page'))
+        self.assertEqual(fetch_page(self.session, self.cache, self.url('/page'), max_age=3600), PAGE.decode())
+        self.assertEqual(len(self.requests_to('/page')), 1)
+
+    def test_retries_server_errors(self):
+        self.server.pages['/flaky'] = [(503, {}, b'Busy'), (200, {}, PAGE)]
+        self.assertEqual(fetch_page(self.session, self.cache, self.url('/flaky')), PAGE.decode())
+        self.assertEqual(len(self.requests_to('/flaky')), 2)
+
+    def test_client_errors_raise(self):
+        with self.assertRaises(Exception):
+            fetch_page(self.session, self.cache, self.url('/missing'))
+        self.assertEqual(self.cache.get(self.url('/missing')), (None, None))
+
+    def test_gather_batch(self):
+        for computer_id in range(1, 6):
+            self.server.pages[f'/computer/{computer_id}'] = (200, {}, f'<p>Computer {computer_id}</p>'.encode())
+        computers = [(computer_id, f'Computer {computer_id}', self.url(f'/computer/{computer_id}'))
+                     for computer_id in range(1, 6)]
+        computers.append((6, 'Missing', self.url('/missing')))
+        output_dir = os.path.join(self.directory, 'prompts')
+        os.makedirs(output_dir)
+
+        errors = io.StringIO()
+        with redirect_stderr(errors):
+            failures = gather_batch(computers, 3, self.cache, 0, output_dir)
+
+        self.assertEqual(failures, 1)
+        self.assertIn('Failed to gather Missing (6)', errors.getvalue())
+        self.assertEqual(sorted(os.listdir(output_dir)), [f'{computer_id}.txt' for computer_id in range(1, 6)])
+        with open(os.path.join(output_dir, '3.txt')) as f:
+            prompt = f.read()
+        self.assertIn("called :'Computer 3'", prompt)
+        self.assertIn('\nComputer 3\n', prompt)
@@ -0,0 +1,26 @@
+import os
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from comcol_backend import image_pipeline
+
+class ReadMetadataTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'original.jpeg')
+        Image.new('RGB', (640, 480), (200, 30, 30)).save(self.path, format='JPEG')
+
+    @override_settings(COMCOL_PICTURE_VARIANTS=[(64, 'tiny'), (320, 'large')])
+    def test_uses_configured_smallest_variant(self):
+        with mock.patch.object(image_pipeline, 'open_square', wraps=image_pipeline.open_square) as open_square:
+            metadata = image_pipeline.read_metadata(self.path)
+        open_square.assert_called_once_with(self.path, 64)
+        self.assertEqual((metadata['width'], metadata['height']), (640, 480))
+
+    def test_explicit_size(self):
+        with mock.patch.object(image_pipeline, 'open_square', wraps=image_pipeline.open_square) as open_square:
+            image_pipeline.read_metadata(self.path, size=50)
+        open_square.assert_called_once_with(self.path, 50)
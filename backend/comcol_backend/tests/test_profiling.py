@@ -0,0 +1,46 @@
+import re
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from comcol_backend.models import Computer
+from comcol_backend.profiling import ProfilingMiddleware, fingerprint, timed
+
+def query_count(response):
+    return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+@override_settings(COMCOL_PROFILING=True, COMCOL_SLOW_REQUEST_MS=60000)
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get('/computers/api/computers/')
+
+    def test_sync(self):
+        def view(request):
+            with timed('serialize'):
+                Computer.objects.count()
+                list(Computer.objects.all())
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+        response = middleware(self.request)
+        self.assertEqual(query_count(response), 2)
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    async def test_async(self):
+        async def view(request):
+            # The async ORM runs the queries in a sync_to_async thread
+            await Computer.objects.acount()
+            await Computer.objects.filter(name='Apple II').aexists()
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(self.request)
+        self.assertEqual(query_count(response), 2)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
@@ -0,0 +1,64 @@
+import os
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from comcol_backend.models import Computer, Picture
+from comcol_backend.tests.test_response_cache import LOCMEM_CACHES
+
+@override_settings(CACHES=LOCMEM_CACHES, COMCOL_RESPONSE_CACHE='responses')
+class ReorderImagesTests(TestCase):
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.computer = Computer.objects.create(name='Apple II')
+        self.pictures = [
+            Picture.objects.create(computer=self.computer, image=f'pictures/{index}.jpeg', unique_id=str(index), order=index)
+            for index in range(3)
+        ]
+
+    def reorder(self, order, computer=None):
+        with mock.patch.dict(os.environ, {'COMCOL_WRITE': '1'}):
+            return self.client.post(f'/computers/api/computers/{(computer or self.computer).pk}/reorder-images/',
+                                    {'order': order}, content_type='application/json')
+
+    def orders(self):
+        return list(self.computer.pictures.order_by('order').values_list('id', flat=True))
+
+    def test_reorder(self):
+        first, second, third = [picture.pk for picture in self.pictures]
+        response = self.reorder([third, first, second])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.orders(), [third, first, second])
+
+    def test_pictures_of_other_computer(self):
+        other = Computer.objects.create(name='Commodore 64')
+        stranger = Picture.objects.create(computer=other, image='pictures/c64.jpeg', unique_id='c64', order=0)
+        before = self.orders()
+        response = self.reorder([stranger.pk, *before])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(stranger.pk), response.json()['error'])
+        self.assertEqual(self.orders(), before)
+        self.assertEqual(Picture.objects.get(pk=stranger.pk).order, 0)
+
+    def test_invalid_orders(self):
+        first = self.pictures[0].pk
+        self.assertEqual(self.reorder([first, first]).status_code, 400)
+        self.assertEqual(self.reorder(['1', '2']).status_code, 400)
+        self.assertEqual(self.reorder(str(first)).status_code, 400)
+
+    def test_cached_responses_replaced(self):
+        urls = ['/computers/api/computers/', f'/computers/api/computers/{self.computer.pk}/']
+        for url in urls:
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        new_order = [picture.pk for picture in reversed(self.pictures)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.reorder(new_order).status_code, 200)
+
+        list_response = self.client.get(urls[0])
+        detail_response = self.client.get(urls[1])
+        self.assertEqual(list_response['X-Cache'], 'MISS')
+        self.assertEqual(detail_response['X-Cache'], 'MISS')
+        self.assertEqual([picture['id'] for picture in list_response.json()[0]['pictures']], new_order)
+        self.assertEqual([picture['id'] for picture in detail_response.json()['pictures']], new_order)
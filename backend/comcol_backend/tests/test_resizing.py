@@ -0,0 +1,59 @@
+import os
+import tempfile
+import uuid
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from comcol_backend import resizing
+from comcol_backend.blobs import acquire_blob, blob_name, store_blob
+from comcol_backend.models import Computer, Picture
+from comcol_backend.tests.test_blobs import CONTENT, SHA256
+
+class ResizedPictureTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(directory.name, 'media'),
+            COMCOL_RESIZE_CACHE_DIR=os.path.join(directory.name, 'resized'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        computer = Computer.objects.create(name='Apple II')
+        blob = acquire_blob(SHA256)
+        store_blob(SHA256, ContentFile(CONTENT))
+        self.unique_id = str(uuid.uuid4())
+        Picture.objects.create(computer=computer, image=blob_name(SHA256), blob=blob, unique_id=self.unique_id)
+
+    def get(self, size, fit='cover', fmt='jpeg'):
+        response = self.client.get(f'/computers/resized/{self.unique_id}-{size}-{fit}.{fmt}')
+        if response.status_code == 200:
+            # Closes the file
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def test_sizes_in_steps(self):
+        self.assertEqual(self.get('100x150'), 200)
+        self.assertEqual(self.get('100x150', fit='contain', fmt='webp'), 200)
+        self.assertEqual(self.get('2000x50'), 200)
+
+    def test_other_sizes_not_found(self):
+        self.assertEqual(self.get('101x150'), 404)
+        self.assertEqual(self.get('100x7'), 404)
+        self.assertEqual(self.get('2050x100'), 404)
+
+    def test_evicted_after_open(self):
+        self.assertEqual(self.get('100x100'), 200)
+        opened = []
+
+        def tracking_open(*args, **kwargs):
+            f = open(*args, **kwargs)
+            opened.append(f)
+            return f
+
+        # Evicted between the open() and the utime() of a hit
+        with mock.patch.object(resizing, 'open', tracking_open, create=True), \
+                mock.patch.object(resizing.os, 'utime', side_effect=[FileNotFoundError, None]):
+            self.assertEqual(self.get('100x100'), 200)
+        self.assertTrue(opened[0].closed)
@@ -0,0 +1,96 @@
+import subprocess
+import sys
+from unittest import mock
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from comcol_backend.models import CollectionVersion, Computer
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'comcol-test-responses',
+    },
+}
+
+# Renames a computer from another process, with a cache of its own, like a
+# management command or the derivatives worker do
+RENAME_SCRIPT = """
+import sys
+import django
+from django.conf import settings
+settings.DATABASES['default']['NAME'] = sys.argv[1]
+settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                   'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+django.setup()
+from comcol_backend.models import Computer
+computer = Computer.objects.get(pk=sys.argv[2])
+computer.name = sys.argv[3]
+computer.save()
+"""
+
+def rename_in_other_process(computer_id, name):
+    subprocess.run(
+        [sys.executable, '-c', RENAME_SCRIPT, str(connection.settings_dict['NAME']), str(computer_id), name],
+        cwd=settings.BASE_DIR, check=True,
+    )
+
+@override_settings(CACHES=LOCMEM_CACHES, COMCOL_RESPONSE_CACHE='responses')
+class CrossProcessInvalidationTests(TransactionTestCase):
+
+    def test_list_changed_by_other_process(self):
+        computer = Computer.objects.create(name='Apple II', maker='Apple', year=1977)
+        url = '/computers/api/computers/'
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        rename_in_other_process(computer.pk, 'Apple IIe')
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([item['name'] for item in response.json()], ['Apple IIe'])
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_detail_changed_by_other_process(self):
+        computer = Computer.objects.create(name='Apple II', maker='Apple', year=1977)
+        url = f'/computers/api/computers/{computer.pk}/'
+        self.assertEqual(self.client.get(url).json()['name'], 'Apple II')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        rename_in_other_process(computer.pk, 'Apple IIe')
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Apple IIe')
+
+@override_settings(CACHES=LOCMEM_CACHES, COMCOL_RESPONSE_CACHE='responses')
+class ResponseCacheKeyTests(TestCase):
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.computer = Computer.objects.create(name='Apple II', maker='Apple', year=1977)
+        self.url = '/computers/api/computers/'
+
+    def test_restored_database(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        version, _ = CollectionVersion.current()
+        # A backup taken now, restored after a write, then written again:
+        # the version number is back to the cached one, for other rows
+        CollectionVersion.objects.update(version=version - 1)
+        Computer.objects.filter(pk=self.computer.pk).update(name='Apple IIe')
+        CollectionVersion.bump()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([item['name'] for item in response.json()], ['Apple IIe'])
+
+    def test_other_database(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        settings_dict = dict(connection.settings_dict, NAME='/elsewhere/db.sqlite3')
+        with mock.patch.dict(connection.settings_dict, settings_dict):
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
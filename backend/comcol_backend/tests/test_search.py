@@ -0,0 +1,43 @@
+from django.test import TestCase, override_settings
+from comcol_backend.models import Computer
+
+@override_settings(COMCOL_RESPONSE_CACHE=None)
+class PaginatedSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Created in the reverse of their rank: a match in the name weighs
+        # more than one in the maker, which weighs more than the description
+        cls.description_match = Computer.objects.create(name='PC 1', maker='IBM', description='Sold by Commodore dealers')
+        cls.maker_match = Computer.objects.create(name='PET 2001', maker='Commodore')
+        cls.name_match = Computer.objects.create(name='Commodore 64', maker='Commodore')
+        Computer.objects.create(name='ZX Spectrum', maker='Sinclair')
+
+    def search(self, **params):
+        response = self.client.get('/computers/api/computers/', {'search': 'commodore', 'fields': 'id,name', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_unpaginated_search_is_ranked(self):
+        ranked = [self.name_match.pk, self.maker_match.pk, self.description_match.pk]
+        self.assertEqual([item['id'] for item in self.search()], ranked)
+
+    def test_paginated_search_keeps_rank_order(self):
+        ranked = [item['id'] for item in self.search()]
+        ids = []
+        page = self.search(page_size=2)
+        self.assertEqual(page['count'], 3)
+        while True:
+            ids.extend(item['id'] for item in page['results'])
+            if page['next'] is None:
+                break
+            response = self.client.get(page['next'])
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+        self.assertEqual(ids, ranked)
+
+    def test_list_without_search_keeps_cursor_pagination(self):
+        page = self.client.get('/computers/api/computers/', {'page_size': 2, 'fields': 'id'}).json()
+        self.assertNotIn('count', page)
+        self.assertIn('cursor=', page['next'])
+        self.assertEqual([item['id'] for item in page['results']], [self.description_match.pk, self.maker_match.pk])
@@ -0,0 +1,38 @@
+import io
+import os
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from comcol_backend.models import CollectionVersion, Computer, Picture
+
+class SeedCollectionTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+        settings = override_settings(MEDIA_ROOT=self.media_root, COMCOL_RESIZE_CACHE_DIR=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def seed(self, *args):
+        output = io.StringIO()
+        call_command('seed_collection', '--computers=3', '--pictures=7', '--templates=2', '--image-size=64',
+                     *args, stdout=output)
+        return output.getvalue()
+
+    def test_seed(self):
+        version, _ = CollectionVersion.current()
+        self.assertIn('Seeded 3 computer(s) and 7 picture(s)', self.seed())
+        self.assertEqual(Computer.objects.count(), 3)
+        self.assertEqual(CollectionVersion.current()[0], version + 1)
+        for picture in Picture.objects.all():
+            self.assertEqual(picture.variants_status, Picture.VARIANTS_READY)
+            for name in [picture.image.name, *picture.variants.values()]:
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, name)), name)
+        names = sorted(Computer.objects.values_list('name', flat=True))
+
+        # The same seed gives the same collection
+        self.seed('--clear')
+        self.assertEqual(sorted(Computer.objects.values_list('name', flat=True)), names)
+        self.assertEqual(Picture.objects.count(), 7)
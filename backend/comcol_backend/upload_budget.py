@@ -0,0 +1,80 @@
+import resource
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+class UploadTooLarge(Exception):
+    """The image would need more memory than the whole budget."""
+
+class BudgetTimeout(Exception):
+    """The budget stayed exhausted by other uploads for too long."""
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB.
+
+    VmHWM belongs to the current address space, unlike ru_maxrss which a
+    spawned child inherits from the parent it was forked from.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class UploadBudget:
+    """
+    Bounds the memory taken by image decoding in this process.
+
+    Each upload reserves the size of its decoded pixels before decoding and
+    waits while the reservations of the uploads in flight would exceed
+    ``limit_bytes``, or while ``max_concurrent`` of them are running. A
+    single image larger than the whole budget is refused outright.
+    """
+
+    def __init__(self, limit_bytes, max_concurrent, timeout):
+        self.limit_bytes = limit_bytes
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.in_use = 0
+        self.active = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes):
+        if nbytes > self.limit_bytes:
+            raise UploadTooLarge(f"Decoding needs {nbytes} bytes, the budget is {self.limit_bytes}")
+        with self.condition:
+            available = self.condition.wait_for(
+                lambda: self.active < self.max_concurrent and self.in_use + nbytes <= self.limit_bytes,
+                timeout=self.timeout,
+            )
+            if not available:
+                raise BudgetTimeout(f"No memory budget available after {self.timeout}s")
+            self.in_use += nbytes
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_use -= nbytes
+                self.active -= 1
+                self.condition.notify_all()
+
+_upload_budget = None
+_lock = threading.Lock()
+
+def get_upload_budget():
+    global _upload_budget
+    with _lock:
+        if _upload_budget is None:
+            _upload_budget = UploadBudget(
+                limit_bytes=getattr(settings, 'COMCOL_UPLOAD_MEMORY_BUDGET', 512 * 1024 * 1024),
+                max_concurrent=getattr(settings, 'COMCOL_UPLOAD_MAX_CONCURRENT', 2),
+                timeout=getattr(settings, 'COMCOL_UPLOAD_BUDGET_TIMEOUT', 30),
+            )
+        return _upload_budget
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+import pyheif
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from PIL import Image
+from .blobs import blob_name, get_storage, store_blob
+from .profiling import timed
+from .upload_budget import BudgetTimeout, UploadTooLarge, get_upload_budget
+
+logger = logging.getLogger(__name__)
+
+HEIC_CONTENT_TYPES = ['image/heif', 'image/heic']
+
+# Decoded RGBA pixels plus the JPEG encoder working memory
+BYTES_PER_PIXEL = 5
+
+class ConversionFailed(Exception):
+    """An uploaded HEIC image could not be converted to JPEG."""
+
+class NotAnImage(Exception):
+    """An uploaded file is not an image Pillow can read."""
+
+class HashingUploadHandlerMixin:
+    """
+    Computes the SHA-256 of an uploaded file from the chunks as they are
+    received, and sets it as ``sha256`` on the resulting file.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler stops the other handlers by
+        # raising from new_file()
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self.hasher.hexdigest()
+        return uploaded_file
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+def upload_sha256(uploaded_file):
+    """
+    The SHA-256 of an uploaded file, read again only when it did not come
+    through the hashing upload handlers.
+    """
+    if getattr(uploaded_file, 'sha256', None) is None:
+        hasher = hashlib.sha256()
+        for chunk in uploaded_file.chunks():
+            hasher.update(chunk)
+        uploaded_file.sha256 = hasher.hexdigest()
+    return uploaded_file.sha256
+
+def convert_heic_upload(uploaded_file):
+    """
+    Converts an uploaded HEIC file to a JPEG spooled in FILE_UPLOAD_TEMP_DIR
+    and returns it as a TemporaryUploadedFile, which the storage then moves
+    into place instead of copying it.
+
+    Only the decoded pixels are held in memory: large uploads are read by
+    libheif from their temporary file, the pixels are wrapped without a copy
+    and encoded straight to disk. Decoding is bounded by the upload budget;
+    raises UploadTooLarge or BudgetTimeout when it is exceeded.
+    """
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        source = uploaded_file.temporary_file_path()
+    else:
+        source = uploaded_file.read()
+
+    # Only parses the container, so the size is known before decoding
+    with timed('image'):
+        heif_file = pyheif.open(source)
+    width, height = heif_file.size
+
+    with get_upload_budget().reserve(width * height * BYTES_PER_PIXEL), timed('image'):
+        heif_file = heif_file.load()
+        image = Image.frombuffer(
+            heif_file.mode, heif_file.size, heif_file.data, "raw", heif_file.mode, heif_file.stride, 1
+        )
+        name = f"{os.path.splitext(uploaded_file.name)[0]}.jpeg"
+        converted = TemporaryUploadedFile(name, 'image/jpeg', 0, None)
+        image.save(converted, format='JPEG')
+        converted.size = converted.tell()
+        converted.seek(0)
+        del image, heif_file
+    return converted
+
+def store_upload(uploaded_file):
+    """
+    Stores an uploaded image as a content-addressed original (see blobs.py)
+    and returns its SHA-256. A photo stored before is neither converted nor
+    stored again; HEIC uploads are converted to JPEG first, raising
+    ConversionFailed, UploadTooLarge or BudgetTimeout when that fails.
+    Other uploads raise NotAnImage unless Pillow recognizes them.
+
+    Call it holding a reference to the blob of upload_sha256(), taken with
+    acquire_blob(), so that a stored original it reuses is not deleted by a
+    concurrent delete of its last picture.
+    """
+    sha256 = upload_sha256(uploaded_file)
+    if get_storage().exists(blob_name(sha256)):
+        logger.info("Upload %s is already stored as blob %s", uploaded_file.name, sha256)
+        return sha256
+    if uploaded_file.content_type in HEIC_CONTENT_TYPES:
+        try:
+            uploaded_file = convert_heic_upload(uploaded_file)
+        except (UploadTooLarge, BudgetTimeout):
+            raise
+        except Exception as e:
+            raise ConversionFailed(str(e)) from e
+    else:
+        # Only parses the headers, the pixels are decoded by the workers
+        uploaded_file.seek(0)
+        try:
+            with Image.open(uploaded_file) as image:
+                image.verify()
+        except Exception as e:
+            raise NotAnImage(str(e)) from e
+    uploaded_file.seek(0)
+    store_blob(sha256, uploaded_file)
+    # The storage moved a spooled file into place
+    uploaded_file.close()
+    return sha256
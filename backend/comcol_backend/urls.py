@@ -27,8 +27,22 @@ router = DefaultRouter()
 router.register(r'computers', ComputerViewSet, basename='computer')
 router.register(r'pictures', PictureViewSet, basename='picture')
 
+if settings.COMCOL_ASGI:
+    # Async read endpoints and upload, matched before the DRF routes they
+    # stand in for
+    from . import async_views
+    async_patterns = [
+        path('api/computers/', async_views.computer_list),
+        path('api/computers/<int:pk>/', async_views.computer_detail),
+        path('api/settings/', async_views.settings_view, name='settings'),
+        path('api/upload-picture/', async_views.upload_picture, name='upload-picture'),
+        path('api/upload-pictures/', async_views.upload_pictures, name='upload-pictures'),
+    ]
+else:
+    async_patterns = []
+
 urlpatterns = [
-    path('computers/', include([
+    path('computers/', include(async_patterns + [
         path('admin/', admin.site.urls),
         path('api/', include(router.urls)),
         path('api/settings/', views.settings, name='settings'),
@@ -37,4 +51,6 @@ urlpatterns = [
 
 urlpatterns += [
     path('computers/api/upload-picture/', PictureUploadView.as_view(), name='upload-picture'),
+    path('computers/api/upload-pictures/', views.BatchPictureUploadView.as_view(), name='upload-pictures'),
+    path('computers/resized/<str:name>', views.resized_picture, name='resized-picture'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
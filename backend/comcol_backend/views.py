@@ -1,20 +1,41 @@
 import logging
 from rest_framework import viewsets
-from rest_framework.filters import SearchFilter
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action, api_view
 from rest_framework import status
+from rest_framework.settings import api_settings
 from .models import Computer, Picture
-from .serializers import ComputerSerializer, PictureSerializer
-from django.db import models
-import pyheif
-from PIL import Image
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import uuid
+from .serializers import (
+    ComputerSerializer, PictureSerializer, parse_field_selection, first_picture_variants, serialize_computer_list,
+    picture_list_rows, SAMPLE_COLUMNS, first_picture_image, serialize_sample,
+)
+from .pagination import ComputerCursorPagination, SearchPagination
+from .filters import CollectionFilter, FullTextSearchFilter
+from .conditional import collection_state, conditional_collection
+from .response_cache import cache_response
+from django.utils.decorators import method_decorator
+from .jobs import bulk_enqueue_derivatives, enqueue_derivatives
+from .signals import collection_changed
+from django.db import models, transaction
+from .uploads import BYTES_PER_PIXEL, ConversionFailed, NotAnImage, store_upload, upload_sha256
+from .blobs import (
+    acquire_blob, acquire_blobs, blob_name, get_storage, ready_fields, ready_fields_by_blob, release_blobs,
+)
+from .upload_budget import BudgetTimeout, UploadTooLarge, get_upload_budget, peak_rss_mb
+from .sampling import sample_computer_ids
+from .stats import collection_stats
+from .renderers import COMPACT_RENDERERS
+from .resizing import get_resize_cache, parse_resized_name, resize_allowed
+from .image_pipeline import open_for_resize, resize_to_box, save_resized
+from django.http import FileResponse, Http404, HttpResponse
+from PIL import UnidentifiedImageError
 import os
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings as django_settings
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +47,14 @@ class PictureViewSet(viewsets.ModelViewSet):
     queryset = Picture.objects.all()
     serializer_class = PictureSerializer
 
+    @method_decorator(conditional_collection)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(conditional_collection)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         if not is_write_enabled():
             return Response({'error': 'Read-only mode: COMCOL_WRITE not set'}, status=status.HTTP_403_FORBIDDEN)
@@ -46,16 +75,78 @@ class PictureViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Read-only mode: COMCOL_WRITE not set'}, status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
+SAMPLE_DEFAULT_SIZE = 12
+SAMPLE_MAX_SIZE = 100
+
 class ComputerViewSet(viewsets.ModelViewSet):
     queryset = Computer.objects.all()
     serializer_class = ComputerSerializer
-    filter_backends = [SearchFilter]
-    search_fields = ['name']
+    filter_backends = [CollectionFilter, FullTextSearchFilter]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *COMPACT_RENDERERS]
+    # Only used when the FTS5 index is not available
+    search_fields = ['name', 'maker', 'description', 'favorite']
+    pagination_class = ComputerCursorPagination
+
+    @property
+    def paginator(self):
+        # Searches are paginated by offset, a cursor would re-sort them by id
+        if not hasattr(self, '_paginator'):
+            searching = bool(FullTextSearchFilter().get_search_terms(self.request))
+            self._paginator = SearchPagination() if searching else self.pagination_class()
+        return self._paginator
+
+    def get_field_selection(self):
+        if self.request.method != 'GET':
+            return None
+        return parse_field_selection(self.request.query_params)
 
     def get_queryset(self):
-        return Computer.objects.prefetch_related(
-            models.Prefetch('pictures', queryset=Picture.objects.order_by('order'))
-        )
+        selection = self.get_field_selection()
+        if selection is None:
+            return Computer.objects.prefetch_related(
+                models.Prefetch('pictures', queryset=Picture.objects.order_by('order'))
+            )
+        # Sparse fieldset: only load the requested columns and skip the
+        # picture prefetch unless the pictures themselves were asked for.
+        columns = [field.name for field in Computer._meta.concrete_fields if field.name in selection]
+        queryset = Computer.objects.only('id', *columns)
+        if 'pictures' in selection:
+            queryset = queryset.prefetch_related(
+                models.Prefetch('pictures', queryset=Picture.objects.order_by('order'))
+            )
+        if 'thumb' in selection:
+            queryset = queryset.annotate(first_variants=first_picture_variants())
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.get_field_selection()
+        return context
+
+    @method_decorator(conditional_collection)
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        # Read-only fast path: plain values() rows turned into dicts by
+        # serialize_computer_list instead of model instances going through
+        # ComputerSerializer. The output is the same.
+        selection = self.get_field_selection() or set(ComputerSerializer.Meta.default_fields)
+        queryset = self.filter_queryset(Computer.objects.all())
+        if 'thumb' in selection:
+            queryset = queryset.annotate(first_variants=first_picture_variants())
+        columns = [field.name for field in Computer._meta.concrete_fields if field.name in selection]
+        rows = queryset.values('id', *columns, *(['first_variants'] if 'thumb' in selection else []))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            pictures = Picture.objects.filter(computer_id__in=[row['id'] for row in page])
+            return self.get_paginated_response(serialize_computer_list(page, selection, picture_list_rows(pictures)))
+        pictures = Picture.objects.filter(computer_id__in=queryset.values('id'))
+        return Response(serialize_computer_list(rows, selection, picture_list_rows(pictures)))
+
+    @method_decorator(conditional_collection)
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         if not is_write_enabled():
@@ -77,6 +168,43 @@ class ComputerViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Read-only mode: COMCOL_WRITE not set'}, status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
+    @action(detail=False, methods=['get'])
+    def sample(self, request):
+        """
+        Returns ``n`` random computers in a compact form for the games: id,
+        name, maker, year and the URLs of the first picture. With
+        ``with_pictures=1`` only computers that have pictures are drawn.
+        """
+        try:
+            n = int(request.query_params.get('n', SAMPLE_DEFAULT_SIZE))
+        except ValueError:
+            return Response({'error': 'n must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= n <= SAMPLE_MAX_SIZE:
+            return Response({'error': f'n must be between 1 and {SAMPLE_MAX_SIZE}'}, status=status.HTTP_400_BAD_REQUEST)
+        with_pictures = request.query_params.get('with_pictures', '') in ('1', 'true', 'yes')
+
+        version, _ = collection_state(request)
+        ids = sample_computer_ids(n, with_pictures, version)
+        rows = (
+            Computer.objects.filter(id__in=ids)
+            .annotate(first_variants=first_picture_variants(), first_image=first_picture_image())
+            .values(*SAMPLE_COLUMNS, 'first_variants', 'first_image')
+        )
+        response = Response(serialize_sample(ids, rows))
+        # A new draw on every request
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    @action(detail=False, methods=['get'])
+    @method_decorator(conditional_collection)
+    def stats(self, request):
+        """
+        Returns the number of computers per maker, year and decade, and the
+        picture totals, for browsing the collection with the list filters.
+        """
+        version, _ = collection_state(request)
+        return Response(collection_stats(version))
+
     @action(detail=True, methods=['post'], url_path='reorder-images')
     def reorder_images(self, request, pk=None):
         if not is_write_enabled():
@@ -87,27 +215,52 @@ class ComputerViewSet(viewsets.ModelViewSet):
         logger.debug(f"Reordering images for computer ID {pk}")
         logger.debug(f"New order received: {new_order}")
 
-        if not isinstance(new_order, list):
+        if not isinstance(new_order, list) or not all(isinstance(picture_id, int) for picture_id in new_order):
             return Response({'error': 'Invalid order format'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(set(new_order)) != len(new_order):
+            return Response({'error': 'Duplicate picture IDs in order'}, status=status.HTTP_400_BAD_REQUEST)
 
-        pictures = list(computer.pictures.all())
-        logger.debug(f"Existing pictures: {[picture.id for picture in pictures]}")
+        with transaction.atomic():
+            pictures = {picture.id: picture for picture in computer.pictures.only('id', 'order', 'computer_id')}
+            logger.debug(f"Existing pictures: {list(pictures)}")
 
-        picture_dict = {picture.id: picture for picture in pictures}
+            unknown = [picture_id for picture_id in new_order if picture_id not in pictures]
+            if unknown:
+                return Response({'error': f'Pictures {unknown} do not belong to computer {computer.id}'},
+                                status=status.HTTP_400_BAD_REQUEST)
 
-        reordered_pictures = []
-        for picture_id in new_order:
-            picture = picture_dict.get(picture_id)
-            if picture:
-                reordered_pictures.append(picture)
-
-        # Update the order in the database
-        for index, picture in enumerate(reordered_pictures):
-            picture.order = index
-            picture.save()
+            # Only write the rows whose position actually changed, in a single
+            # statement and a single write transaction
+            changed = []
+            for index, picture_id in enumerate(new_order):
+                picture = pictures[picture_id]
+                if picture.order != index:
+                    picture.order = index
+                    changed.append(picture)
+            if changed:
+                Picture.objects.bulk_update(changed, ['order'])
+                # bulk_update does not send post_save
+                collection_changed.send(sender=Picture, computer_ids=[computer.id])
 
         return Response({'message': 'Image order updated successfully'}, status=status.HTTP_200_OK)
 
+def upload_error(e):
+    """
+    The status and message of an upload refused by store_upload, which is
+    logged.
+    """
+    if isinstance(e, UploadTooLarge):
+        logger.error("Refused HEIC image: %s", e)
+        return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, 'Image is too large to process'
+    if isinstance(e, BudgetTimeout):
+        logger.error("HEIC conversion not started: %s", e)
+        return status.HTTP_503_SERVICE_UNAVAILABLE, 'Server busy, please retry'
+    if isinstance(e, NotAnImage):
+        logger.error("Refused upload that is not an image: %s", e)
+        return 400, 'Not a valid image'
+    logger.error("Failed to convert HEIC image: %s", e)
+    return 400, 'Failed to process HEIC image'
+
 class PictureUploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)
 
@@ -122,65 +275,175 @@ class PictureUploadView(APIView):
         next_order = (max_order or 0) + 1
         request.data['order'] = next_order
         uploaded_file = request.FILES.get('image')
-        if uploaded_file:
-            print(f"Uploaded file: {uploaded_file.name}, Content type: {uploaded_file.content_type}")
-        if uploaded_file and uploaded_file.content_type in [ 'image/heif', 'image/heic' ]:
-            try:
-                heif_file = pyheif.read(uploaded_file.read())
-                image = Image.frombytes(
-                    heif_file.mode, heif_file.size, heif_file.data, "raw", heif_file.mode, heif_file.stride
-                )
-                output = BytesIO()
-                image.save(output, format='JPEG')
-                output.seek(0)
-                uploaded_file = InMemoryUploadedFile(
-                    output, 'image', f"{uploaded_file.name.split('.')[0]}.jpeg", 'image/jpeg', output.getbuffer().nbytes, None
-                )
-                request.FILES['image'] = uploaded_file
-                request.data['image'] = uploaded_file
-            except Exception as e:
-                logger.error("Failed to convert HEIC image: %s", e)
-                return Response({'error': 'Failed to process HEIC image'}, status=400)
-        if uploaded_file:
-            uploaded_file.seek(0)
+        if not uploaded_file:
+            return Response({'error': 'Image is required'}, status=400)
+        logger.debug("Uploaded file: %s, content type: %s", uploaded_file.name, uploaded_file.content_type)
         serializer = PictureSerializer(data=request.data)
-        if serializer.is_valid():
-            picture = serializer.save()
-            # Now create the resized versions using the uuid from the saved picture
-            original_path = picture.image.path
-            uuid_str = os.path.splitext(os.path.basename(original_path))[0]
-            image = Image.open(original_path)
-            base_dir = os.path.dirname(original_path)
-            sizes = [
-                (100,  'thumb'),
-                (200, 'gallery'),
-                (300, 'portrait'),
-            ]
-            for size, suffix in sizes:
-                img_copy = image.copy()
-                img_copy = img_copy.convert('RGB')
-                # Center crop to square before resizing
-                width, height = img_copy.size
-                min_dim = min(width, height)
-                left = (width - min_dim) // 2
-                top = (height - min_dim) // 2
-                right = left + min_dim
-                bottom = top + min_dim
-                img_copy = img_copy.crop((left, top, right, bottom))
-                img_copy.thumbnail((size, size), Image.LANCZOS)
-                thumb_filename = os.path.join(base_dir, f"{uuid_str}-{suffix}.jpeg")
-                img_copy.save(thumb_filename, format='JPEG')
-            logger.info("Serializer is valid. Saving picture.")
-            return Response(serializer.data, status=201)
-        logger.error("Serializer errors: %s", serializer.errors)
-        return Response(serializer.errors, status=400)
+        if not serializer.is_valid():
+            logger.error("Serializer errors: %s", serializer.errors)
+            return Response(serializer.errors, status=400)
+        peak_before = peak_rss_mb()
+        # Referenced before the original is stored or reused, see store_upload
+        sha256 = upload_sha256(uploaded_file)
+        blob = acquire_blob(sha256)
+        try:
+            store_upload(uploaded_file)
+            with transaction.atomic():
+                # The variants and metadata of the same content, when ready
+                ready = ready_fields(blob)
+                picture = serializer.save(
+                    image=blob_name(sha256), blob=blob, unique_id=str(uuid.uuid4()), extension='jpeg', **(ready or {})
+                )
+        except (UploadTooLarge, BudgetTimeout, ConversionFailed, NotAnImage) as e:
+            release_blobs({sha256: 1})
+            code, message = upload_error(e)
+            return Response({'error': message}, status=code)
+        except Exception:
+            release_blobs({sha256: 1})
+            raise
+        if ready is None:
+            # The resized versions are generated by the process_derivatives
+            # worker, the response reports them as pending until then.
+            enqueue_derivatives(picture)
+            logger.info("Saved picture %s, variants queued.", picture.id)
+        else:
+            logger.info("Saved picture %s, variants reused.", picture.id)
+        logger.info("Upload of picture %s raised peak RSS by %.1f MB", picture.id, peak_rss_mb() - peak_before)
+        return Response(serializer.data, status=201)
+
+class BatchPictureUploadView(APIView):
+    """
+    Adds several pictures, sent as ``images`` files, to one computer in a
+    single request. The files are stored in parallel, then the pictures are
+    created together after the last one of the computer and their variants
+    queued for the process_derivatives workers. Responds with a result per
+    file in the order they were sent: 201 when all were added, 207 when only
+    some were.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        if not is_write_enabled():
+            return Response({'error': 'Read-only mode: COMCOL_WRITE not set'}, status=status.HTTP_403_FORBIDDEN)
+        computer_id = request.data.get('computer')
+        if not computer_id:
+            return Response({'error': 'Computer ID is required'}, status=400)
+        computer = Computer.objects.filter(pk=computer_id).only('id').first() if computer_id.isdigit() else None
+        if computer is None:
+            return Response({'error': f'Unknown computer {computer_id}'}, status=400)
+        uploaded_files = request.FILES.getlist('images')
+        if not uploaded_files:
+            return Response({'error': 'Images are required'}, status=400)
+        peak_before = peak_rss_mb()
+
+        # Referenced before the originals are stored or reused, see
+        # store_upload
+        references = Counter(upload_sha256(uploaded_file) for uploaded_file in uploaded_files)
+        blobs = acquire_blobs(references)
+        # More threads than the upload budget lets convert at once would
+        # only wait for it
+        workers = min(len(uploaded_files), getattr(django_settings, 'COMCOL_UPLOAD_MAX_CONCURRENT', 2))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='comcol-upload') as executor:
+            futures = [executor.submit(store_upload, uploaded_file) for uploaded_file in uploaded_files]
+        results = [None] * len(uploaded_files)
+        stored = []
+        unused = Counter()
+        for index, (uploaded_file, future) in enumerate(zip(uploaded_files, futures)):
+            try:
+                stored.append((index, future.result()))
+            except (UploadTooLarge, BudgetTimeout, ConversionFailed, NotAnImage) as e:
+                unused[upload_sha256(uploaded_file)] += 1
+                code, message = upload_error(e)
+                results[index] = {'file': uploaded_file.name, 'status': code, 'error': message}
+        if unused:
+            release_blobs(unused)
+
+        if stored:
+            try:
+                with transaction.atomic():
+                    max_order = Picture.objects.filter(computer=computer).aggregate(models.Max('order'))['order__max']
+                    # The variants and metadata of the same content, when ready
+                    ready = ready_fields_by_blob([blobs[sha256] for _, sha256 in stored])
+                    created = Picture.objects.bulk_create([
+                        Picture(
+                            computer=computer, order=(max_order or 0) + 1 + position, image=blob_name(sha256),
+                            blob=blobs[sha256], unique_id=str(uuid.uuid4()), extension='jpeg',
+                            **ready.get(blobs[sha256].pk, {})
+                        )
+                        for position, (_, sha256) in enumerate(stored)
+                    ])
+                    queued = bulk_enqueue_derivatives(created)
+            except Exception:
+                release_blobs(Counter(sha256 for _, sha256 in stored))
+                raise
+            # bulk_create() does not send post_save
+            collection_changed.send(sender=Picture, computer_ids=[computer.pk])
+            for (index, _), data in zip(stored, PictureSerializer(created, many=True).data):
+                results[index] = {'file': uploaded_files[index].name, 'status': 201, 'picture': data}
+            logger.info("Saved %d picture(s) for computer %s, %d with variants queued.",
+                        len(created), computer.pk, queued)
+
+        logger.info("Upload of %d file(s) raised peak RSS by %.1f MB", len(uploaded_files), peak_rss_mb() - peak_before)
+        if len(stored) == len(uploaded_files):
+            response_status = status.HTTP_201_CREATED
+        elif stored:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'results': results}, status=response_status)
+
+def settings_data():
+    return {
+        'description': "Fred's\nComputer Collection",
+        'read_only': not is_write_enabled(),
+    }
 
 @api_view(['GET'])
+@conditional_collection
 def settings(request):
     """
     Returns server settings including description and read-only status.
     """
-    return Response({
-        'description': "Fred's\nComputer Collection",
-        'read_only': not is_write_enabled(),
-    })
\ No newline at end of file
+    return Response(settings_data())
+
+def resized_picture(request, name):
+    """
+    Serves a picture resized on demand, named
+    ``<unique_id>-<width>x<height>-<fit>.<format>`` (see resizing.py), and
+    renders it into the resize cache on the first request.
+    """
+    resize_cache = get_resize_cache()
+    params = parse_resized_name(name)
+    if resize_cache is None or params is None:
+        raise Http404("No such resized picture")
+    unique_id, width, height, fit, fmt = params
+    if not resize_allowed(width, height):
+        raise Http404("No such resized picture")
+    image_name = Picture.objects.filter(unique_id=unique_id).values_list('image', flat=True).first()
+    if not image_name:
+        raise Http404("No such picture")
+    original_path = get_storage().path(image_name)
+
+    def render(path):
+        with open_for_resize(original_path, width, height) as image:
+            decoded_width, decoded_height = image.size
+            with get_upload_budget().reserve(decoded_width * decoded_height * BYTES_PER_PIXEL):
+                save_resized(resize_to_box(image, width, height, fit), path, fmt)
+
+    try:
+        f = resize_cache.open_or_render(unique_id, width, height, fit, fmt, render)
+    except FileNotFoundError:
+        raise Http404("The original of this picture is missing")
+    except UnidentifiedImageError:
+        logger.error("Original of picture %s cannot be decoded: %s", unique_id, image_name)
+        raise Http404("The original of this picture cannot be decoded")
+    except UploadTooLarge as e:
+        logger.error("Refused to resize picture %s: %s", unique_id, e)
+        return HttpResponse("Image is too large to process", status=413, content_type='text/plain')
+    except BudgetTimeout as e:
+        logger.error("Resize of picture %s not started: %s", unique_id, e)
+        return HttpResponse("Server busy, please retry", status=503, content_type='text/plain')
+    response = FileResponse(f, content_type=f'image/{fmt}')
+    # The original of a picture never changes, nor does this rendering of it
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless COMCOL_PROFILING is set
+    'comcol_backend.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,9 +84,55 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # One connection per worker for its whole life, instead of one per request
+        'CONN_MAX_AGE': None,
     }
 }
 
+# The public deployment runs without COMCOL_WRITE and the file never changes
+# under it, so it is opened immutable: SQLite then skips all locking. Not when
+# a -wal file is left over, as immutable connections would ignore its content.
+if os.environ.get('COMCOL_WRITE') is None and not os.path.exists(f"{DATABASES['default']['NAME']}-wal"):
+    DATABASES['default']['NAME'] = f"file:{DATABASES['default']['NAME']}?mode=ro&immutable=1"
+
+# Applied on every new connection by comcol_backend/db.py. journal_mode and
+# synchronous are skipped on read-only connections.
+COMCOL_SQLITE_PRAGMAS = {
+    # Readers do not block the writer and the writer does not block readers
+    'journal_mode': 'wal',
+    # Safe with WAL, only the last transactions can be lost on a power failure
+    'synchronous': 'normal',
+    # Wait for a lock for up to 10 s instead of failing with "database is locked"
+    'busy_timeout': 10000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are in KiB
+    'cache_size': -32000,
+    'temp_store': 'memory',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered API responses, see response_cache.py. File based so that all
+    # gunicorn workers share it.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'responses',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
+# CACHES alias used to cache API responses, None to disable
+COMCOL_RESPONSE_CACHE = 'responses'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -139,3 +188,73 @@ CORS_ALLOWED_ORIGINS = [
 
 MEDIA_URL = '/computers/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE are spooled here. On the
+# same filesystem as MEDIA_ROOT, so that they are moved into place, not copied.
+FILE_UPLOAD_TEMP_DIR = BASE_DIR / 'upload_tmp'
+
+# Hash the uploads while they are received, for the content-addressed
+# storage of the originals (see blobs.py)
+FILE_UPLOAD_HANDLERS = [
+    'comcol_backend.uploads.HashingMemoryFileUploadHandler',
+    'comcol_backend.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Memory budget for decoding uploaded images in one worker process: total
+# bytes of decoded pixels, and number of images decoded at the same time
+COMCOL_UPLOAD_MEMORY_BUDGET = 512 * 1024 * 1024
+COMCOL_UPLOAD_MAX_CONCURRENT = 2
+# Seconds an upload waits for budget before getting a 503
+COMCOL_UPLOAD_BUDGET_TIMEOUT = 30
+
+# Set by entrypoint-asgi.sh: serve the read endpoints with async views and
+# run uploads in a pool of COMCOL_IMAGE_EXECUTOR_WORKERS threads per worker
+COMCOL_ASGI = os.environ.get('COMCOL_ASGI') is not None
+COMCOL_IMAGE_EXECUTOR_WORKERS = 4
+
+# Square variants generated for every picture, as (size in pixels, suffix)
+COMCOL_PICTURE_VARIANTS = [
+    (100, 'thumb'),
+    (200, 'gallery'),
+    (300, 'portrait'),
+]
+
+# Snapshot of the read-only API written by the export_static_api command,
+# served by nginx instead of Django when COMCOL_WRITE is unset
+COMCOL_STATIC_API_DIR = BASE_DIR / 'static_api'
+
+# Pictures resized on demand (/computers/resized/...): disk cache, read by
+# nginx, bounded by LRU eviction, and largest width or height served. Widths
+# and heights are multiples of the step, which the frontend rounds up to.
+COMCOL_RESIZE_CACHE_DIR = BASE_DIR / 'resize_cache'
+COMCOL_RESIZE_CACHE_BYTES = 512 * 1024 * 1024
+COMCOL_RESIZE_MAX_SIZE = 2000
+COMCOL_RESIZE_STEP = 50
+
+# Per-request profiling, see profiling.py: query count and time, serializer
+# and image processing time in a Server-Timing header, and requests slower
+# than COMCOL_SLOW_REQUEST_MS logged with their query fingerprints.
+COMCOL_PROFILING = os.environ.get('COMCOL_PROFILING') is not None
+COMCOL_SLOW_REQUEST_MS = int(os.environ.get('COMCOL_SLOW_REQUEST_MS', 500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        # One JSON object per line
+        'comcol_backend.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,32 @@
+#!/bin/bash
+set -e
+
+# Same as entrypoint.sh, with Django served over ASGI by uvicorn workers:
+# the read endpoints are async views and uploads run in a thread pool
+export COMCOL_ASGI=1
+
+# In read-only mode nginx serves the API from a static snapshot, which must
+# never outlive a switch to write mode
+if [ -z "$COMCOL_WRITE" ]; then
+    python manage.py export_static_api
+else
+    rm -rf /app/static_api
+fi
+
+# Start Gunicorn with uvicorn workers in the background
+exec gunicorn comcol_backend.asgi:application \
+    --bind 127.0.0.1:8000 \
+    --worker-class uvicorn_worker.UvicornWorker \
+    --workers 3 \
+    --timeout 300 &
+
+# Picture variants are generated by a background worker (write mode only)
+if [ -n "$COMCOL_WRITE" ]; then
+    python manage.py process_derivatives &
+fi
+
+# Wait for Gunicorn to start
+sleep 3
+
+# Start Nginx in the foreground
+exec nginx -g 'daemon off;'
@@ -1,13 +1,27 @@
 #!/bin/bash
 set -e
 
+# In read-only mode nginx serves the API from a static snapshot, which must
+# never outlive a switch to write mode
+if [ -z "$COMCOL_WRITE" ]; then
+    python manage.py export_static_api
+else
+    rm -rf /app/static_api
+fi
+
 # Start Gunicorn in the background
 exec gunicorn comcol_backend.wsgi:application \
     --bind 127.0.0.1:8000 \
-    --workers 3 &
+    --workers 3 \
+    --timeout 300 &
 
 #    --env DJANGO_SETTINGS_MODULE=prod-settings \
 
+# Picture variants are generated by a background worker (write mode only)
+if [ -n "$COMCOL_WRITE" ]; then
+    python manage.py process_derivatives &
+fi
+
 # Wait for Gunicorn to start
 sleep 3
 
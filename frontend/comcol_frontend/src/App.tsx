@@ -7,6 +7,7 @@ import Modal from 'react-modal'; // Added modal library
 import { FaSortUp, FaSortDown, FaPlus, FaPen, FaList, FaTh, FaGamepad } from 'react-icons/fa'; // Added FaGamepad
 import { FaHeart } from 'react-icons/fa';
 import ROUTES from './routes';
+import { placeholderStyle } from './placeholder';
 import { useEditMode } from './EditModeContext';
 import { Link } from 'react-router-dom';
 import GamePage from './GamePage';
@@ -22,7 +23,7 @@ interface Computer {
   maker: string;
   year?: number;
   description?: string;
-  pictures: { id: number; image: string; thumb?: string; gallery?: string }[];
+  pictures: { id: number; image: string; thumb?: string; gallery?: string; dominant_color?: string; placeholder?: string }[];
   favorite?: string;
 }
 
@@ -346,6 +347,7 @@ function TableRow({ computer, context }: { computer: Computer; context: number[]
             src={computer.pictures[0].thumb || computer.pictures[0].image}
             alt={`Computer ${computer.name}`}
             className="table-row-image"
+            style={placeholderStyle(computer.pictures[0])}
           />
         ) : (
           <div className="table-row-placeholder"></div>
@@ -461,6 +463,7 @@ function ComputerList({ computers, searchTerm, setSearchTerm, onAdd }: ComputerL
                   src={computer.pictures[0].gallery || computer.pictures[0].image}
                   alt={computer.name}
                   className="grid-image"
+                  style={placeholderStyle(computer.pictures[0])}
                 />
               ) : (
                 <div className="grid-placeholder">{computer.name}</div>
@@ -1,6 +1,6 @@
 import React, { useEffect } from 'react';
 import { useDropzone, FileRejection, DropEvent } from 'react-dropzone';
-import { API_BASE_URL, MEDIA_BASE_URL } from './api';
+import { API_BASE_URL, MEDIA_BASE_URL, uploadPictures } from './api';
 import './EditImages.css';
 
 interface ImageWellProps {
@@ -19,30 +19,26 @@ const ImageWell: React.FC<ImageWellProps> = ({ computerId, onAdd }) => {
       setIsDragActive(false);
       console.log('Files dropped:', acceptedFiles);
 
-      acceptedFiles.forEach(async (file) => {
-        const formData = new FormData();
-        formData.append('image', file);
-        formData.append('computer', computerId.toString());
-
-        try {
-          const response = await fetch(`${API_BASE_URL}upload-picture/`, {
-            method: 'POST',
-            body: formData,
+      if (acceptedFiles.length === 0) {
+        return;
+      }
+      // The whole set in one request, see uploadPictures
+      uploadPictures(computerId, acceptedFiles)
+        .then((results) => {
+          const added: { id: number; image: string }[] = [];
+          results.forEach((result) => {
+            if (result.picture) {
+              added.push({ id: result.picture.id, image: `${MEDIA_BASE_URL}${result.picture.image}` });
+            } else {
+              console.error(`Error uploading ${result.file}:`, result.error);
+            }
           });
-
-          if (!response.ok) {
-            throw new Error('Failed to upload image');
-          }
-
-          const data = await response.json();
-          console.log('Image uploaded successfully:', data);
-
-          const imageUrl = `${MEDIA_BASE_URL}${data.image}`;
-          onAdd([{ id: data.id, image: imageUrl }]);
-        } catch (error) {
-          console.error('Error uploading image:', error);
-        }
-      });
+          console.log('Images uploaded successfully:', added);
+          onAdd(added);
+        })
+        .catch((error) => {
+          console.error('Error uploading images:', error);
+        });
     },
     accept: {
       'image/*': [],
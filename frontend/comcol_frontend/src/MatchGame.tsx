@@ -1,12 +1,12 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { fetchComputers } from './api';
+import { fetchGameComputers } from './api';
 import './App.css';
 
 interface Computer {
 	id: number;
 	name: string;
-	pictures: { portrait?: string; image: string }[];
+	picture: { portrait?: string; image: string };
 }
 
 const MatchGame: React.FC = () => {
@@ -22,9 +22,7 @@ const MatchGame: React.FC = () => {
 	useEffect(() => {
 		const setup = async () => {
 			setLoading(true);
-			const comps: Computer[] = await fetchComputers();
-			const withImages = comps.filter(c => c.pictures && c.pictures.length > 0);
-			const selected = shuffle(withImages).slice(0, 8);
+			const selected: Computer[] = await fetchGameComputers(8);
 			setComputers(selected);
 			setNames(shuffle(selected.map(c => c.name)));
 			setLoading(false);
@@ -95,7 +93,7 @@ const MatchGame: React.FC = () => {
 				{computers.map((comp, idx) => (
 					<div key={comp.id} style={{ display: 'flex', flexDirection: 'column', alignItems: 'center', minWidth: 180 }}>
 						<img
-							src={comp.pictures[0].portrait || comp.pictures[0].image}
+							src={comp.picture.portrait || comp.picture.image}
 							alt={comp.name}
 							style={{ width: 120, height: 120, objectFit: 'cover', borderRadius: 10, marginBottom: 12 }}
 						/>
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { fetchComputers } from './api';
+import { fetchGameComputers } from './api';
 import './App.css';
 
 interface MemoryCard {
@@ -33,12 +33,10 @@ const MemoryGame: React.FC = () => {
 	useEffect(() => {
 		const setupGame = async () => {
 			setLoading(true);
-			const computers = await fetchComputers();
-			const filtered = computers.filter((c: any) => c.pictures && c.pictures.length > 0);
-			const selected = shuffle(filtered).slice(0, 8);
+			const selected = await fetchGameComputers(8);
 			let cardList: MemoryCard[] = [];
 			selected.forEach((comp: any, idx: number) => {
-				const img = comp.pictures[0].portrait || comp.pictures[0].image;
+				const img = comp.picture.portrait || comp.picture.image;
 				cardList.push({ id: idx * 2, computerId: comp.id, image: img, matched: false, flipped: false });
 				cardList.push({ id: idx * 2 + 1, computerId: comp.id, image: img, matched: false, flipped: false });
 			});
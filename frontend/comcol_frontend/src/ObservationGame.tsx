@@ -1,11 +1,11 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { fetchComputers } from './api';
+import { fetchGameComputers } from './api';
 
 interface Computer {
 	id: number;
 	name: string;
-	pictures: { image: string }[];
+	picture: { image: string };
 }
 
 const TILE_SIZE = 48; // px for detail and for computer images (smaller)
@@ -33,17 +33,7 @@ const ObservationGame: React.FC = () => {
 	// Setup game
 	useEffect(() => {
 		const setup = async () => {
-			const comps: Computer[] = await fetchComputers();
-			const withImages = comps.filter(c => c.pictures && c.pictures.length > 0);
-			const chosen = [];
-			const used = new Set();
-			while (chosen.length < 8 && used.size < withImages.length) {
-				const idx = getRandomInt(withImages.length);
-				if (!used.has(idx)) {
-					chosen.push(withImages[idx]);
-					used.add(idx);
-				}
-			}
+			const chosen: Computer[] = await fetchGameComputers(8);
 			setComputers(chosen);
 			setOrder(shuffle(Array.from({ length: 8 }, (_, i) => i)));
 			setRound(0);
@@ -153,9 +143,9 @@ const ObservationGame: React.FC = () => {
 				{order.map((i, idx) => (
 					<div key={i} style={{ width: TILE_SIZE * DETAIL_GRID, margin: 4, textAlign: 'center' }}>
 						<img
-							src={computers[i].pictures[0].image}
+							src={computers[i].picture.image}
 							alt={computers[i].name}
-							style={getCenterCropStyle(computers[i].pictures[0].image) as React.CSSProperties}
+							style={getCenterCropStyle(computers[i].picture.image) as React.CSSProperties}
 							onClick={() => selected === null && handleSelect(i)}
 							tabIndex={0}
 							role="button"
@@ -169,7 +159,7 @@ const ObservationGame: React.FC = () => {
 			<div
 				key={round} // force remount to avoid animation and blanking issues
 				style={{
-					...(getDetailStyle(computers[detail.compIdx].pictures[0].image, detail.tileIdx) as React.CSSProperties),
+					...(getDetailStyle(computers[detail.compIdx].picture.image, detail.tileIdx) as React.CSSProperties),
 					margin: '0 auto 24px',
 					backgroundColor: flash === 'red' ? '#ffdddd' : flash === 'green' ? '#ddffdd' : '#fff',
 				}}
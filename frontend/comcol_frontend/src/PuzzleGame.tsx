@@ -1,11 +1,11 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { fetchComputers } from './api';
+import { fetchGameComputers } from './api';
 
 interface Computer {
 	id: number;
 	name: string;
-	pictures: { image: string }[];
+	picture: { image: string };
 }
 
 interface Tile {
@@ -52,10 +52,8 @@ const PuzzleGame: React.FC = () => {
 
 	useEffect(() => {
 		const setup = async () => {
-			const computers: Computer[] = await fetchComputers();
-			const withImages = computers.filter(c => c.pictures && c.pictures.length > 0);
-			const comp = withImages[Math.floor(Math.random() * withImages.length)];
-			setComputer(comp);
+			const [comp]: Computer[] = await fetchGameComputers(1);
+			setComputer(comp ?? null);
 			const shuffled = getShuffledTiles();
 			setTiles(shuffled);
 			setEmptyIdx(15);
@@ -106,7 +104,7 @@ const PuzzleGame: React.FC = () => {
 				continue;
 			}
 			// Calculate background position for the tile
-			const src = computer.pictures[0].image;
+			const src = computer.picture.image;
 			const tileRow = Math.floor(tile.idx / 4);
 			const tileCol = tile.idx % 4;
 			grid.push(
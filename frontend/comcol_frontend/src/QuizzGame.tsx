@@ -1,12 +1,12 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { fetchComputers } from './api';
+import { fetchGameComputers } from './api';
 import './App.css';
 
 interface Computer {
 	id: number;
 	name: string;
-	pictures: { image: string }[];
+	picture: { image: string };
 }
 
 const getRandomElements = (arr: any[], n: number) => {
@@ -35,9 +35,7 @@ const QuizzGame: React.FC = () => {
 
 	useEffect(() => {
 		const setup = async () => {
-			const computers: Computer[] = await fetchComputers();
-			const withImages = computers.filter(c => c.pictures && c.pictures.length > 0);
-			const selectedQuestions = getRandomElements(withImages, 10);
+			const selectedQuestions: Computer[] = await fetchGameComputers(10);
 			setQuestions(selectedQuestions);
 		};
 		setup();
@@ -101,7 +99,7 @@ const QuizzGame: React.FC = () => {
 	}
 
 	const q = questions[current];
-	const image = q.pictures[0]?.image;
+	const image = q.picture?.image;
 
 	return (
 		<div className="quizz-game" style={{ maxWidth: 900, margin: '40px auto', textAlign: 'center' }}>
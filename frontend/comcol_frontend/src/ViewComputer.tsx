@@ -1,5 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { Computer } from './types';
+import { placeholderStyle } from './placeholder';
+import { resizedImageUrl } from './api';
 import './ViewComputer.css';
 import { useSearchParams, useNavigate } from 'react-router-dom';
 
@@ -89,6 +91,7 @@ const ViewComputer: React.FC<{ computer: Computer | null }> = ({ computer }) =>
 						src={computer.pictures[0].portrait || computer.pictures[0].image}
 						alt={computer.name}
 						className="computer-image"
+						style={placeholderStyle(computer.pictures[0])}
 					/>
 				)}
 				<div className="computer-details">
@@ -118,9 +121,10 @@ const ViewComputer: React.FC<{ computer: Computer | null }> = ({ computer }) =>
 				{computer.pictures.map((picture, index) => (
 					<img
 						key={picture.id}
-						src={picture.gallery || picture.image}
+						src={resizedImageUrl(picture, 100, 100)}
 						alt="Computer"
 						className="gallery-image"
+						style={placeholderStyle(picture)}
 						onClick={() => handleZoom(index)}
 					/>
 				))}
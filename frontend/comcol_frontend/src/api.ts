@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { CollectionStats, ComputerFilters, GameComputer, Picture, SampleComputer } from './types';
 
 // Detect environment and set appropriate URLs
 // In development (localhost:3000), point to Django dev server
@@ -13,13 +14,105 @@ const MEDIA_BASE_URL = isDevelopment
 	? 'http://localhost:8000/computers/media/'
 	: `${window.location.origin}/computers/media/`;
 
-export const fetchComputers = async (searchTerm = '') => {
-	const response = await axios.get(`${API_BASE_URL}computers/`, {
-		params: { search: searchTerm },
+const RESIZED_BASE_URL = isDevelopment
+	? 'http://localhost:8000/computers/resized/'
+	: `${window.location.origin}/computers/resized/`;
+
+// Sizes are rounded up to this step so that nearby layouts share cached renders
+const RESIZED_STEP = 50;
+
+// URL of a picture resized on demand to cover (or fit in) a box of
+// width x height CSS pixels on this screen
+export const resizedImageUrl = (picture: Picture, width: number, height: number, fit: 'cover' | 'contain' = 'cover') => {
+	if (!picture.unique_id) {
+		return picture.image;
+	}
+	const scale = window.devicePixelRatio || 1;
+	const w = Math.ceil((width * scale) / RESIZED_STEP) * RESIZED_STEP;
+	const h = Math.ceil((height * scale) / RESIZED_STEP) * RESIZED_STEP;
+	return `${RESIZED_BASE_URL}${picture.unique_id}-${w}x${h}-${fit}.jpeg`;
+};
+
+// Column-oriented list sent for ?format=columns (see the backend renderers.py)
+interface ColumnTable {
+	columns: string[];
+	rows: unknown[][];
+	prefixed?: string[];
+}
+
+interface ColumnarList {
+	media_prefix: string;
+	computers: ColumnTable;
+	pictures?: ColumnTable;
+}
+
+const tableObjects = (table: ColumnTable, mediaPrefix: string) => {
+	const prefixed = new Set(table.prefixed ?? []);
+	return table.rows.map(row => {
+		const item: Record<string, unknown> = {};
+		table.columns.forEach((column, index) => {
+			const value = row[index];
+			item[column] = prefixed.has(column) && value !== null ? mediaPrefix + value : value;
+		});
+		return item;
+	});
+};
+
+// Back to the plain JSON list: computers with their pictures
+const decodeColumnarList = (data: ColumnarList) => {
+	const computers = tableObjects(data.computers, data.media_prefix);
+	if (!data.pictures) {
+		return computers;
+	}
+	const pictures = new Map<unknown, Record<string, unknown>[]>();
+	for (const picture of tableObjects(data.pictures, data.media_prefix)) {
+		const list = pictures.get(picture.computer) ?? [];
+		list.push(picture);
+		pictures.set(picture.computer, list);
+	}
+	return computers.map(computer => ({ ...computer, pictures: pictures.get(computer.id) ?? [] }));
+};
+
+export const fetchComputers = async (searchTerm = '', filters: ComputerFilters = {}) => {
+	const { has_pictures, ...rest } = filters;
+	// Empty parameters are left out: without search and filters, nginx
+	// answers from the static snapshot (see nginx.conf)
+	const params: Record<string, string | number> = { format: 'columns' };
+	if (searchTerm) {
+		params.search = searchTerm;
+	}
+	for (const [name, value] of Object.entries(rest)) {
+		if (value !== undefined && value !== '') {
+			params[name] = value;
+		}
+	}
+	if (has_pictures !== undefined) {
+		params.has_pictures = has_pictures ? 1 : 0;
+	}
+	const response = await axios.get(`${API_BASE_URL}computers/`, { params });
+	return decodeColumnarList(response.data);
+};
+
+// Counts per maker, year and decade, to browse the collection with filters
+export const fetchStats = async (): Promise<CollectionStats> => {
+	const response = await axios.get(`${API_BASE_URL}computers/stats/`);
+	return response.data;
+};
+
+// Random computers in the compact form used by the games
+export const fetchSample = async (n: number, withPictures = true): Promise<SampleComputer[]> => {
+	const response = await axios.get(`${API_BASE_URL}computers/sample/`, {
+		params: { n, with_pictures: withPictures ? 1 : 0 },
 	});
 	return response.data;
 };
 
+// Random computers that have a picture, for the games
+export const fetchGameComputers = async (n: number): Promise<GameComputer[]> => {
+	const sample = await fetchSample(n, true);
+	return sample.filter((c): c is GameComputer => c.picture !== null);
+};
+
 interface Computer {
 	id?: number;
 	name: string;
@@ -66,6 +159,32 @@ export const uploadPicture = async (pictureData: FormData): Promise<Picture> =>
 
 const pendingDeletes = new Set<number>();
 
+export interface UploadResult {
+	file: string;
+	status: number;
+	picture?: Picture;
+	error?: string;
+}
+
+// Uploads several pictures of a computer in one request, with a result per
+// file in the same order (some may have failed)
+export const uploadPictures = async (computerId: number, files: File[]): Promise<UploadResult[]> => {
+	const formData = new FormData();
+	formData.append('computer', computerId.toString());
+	files.forEach((file) => formData.append('images', file));
+	const response = await axios.post(`${API_BASE_URL}upload-pictures/`, formData, {
+		headers: {
+			'Content-Type': 'multipart/form-data',
+		},
+		// 400 when no file could be added, still with the results
+		validateStatus: (status) => status < 500,
+	});
+	if (!response.data.results) {
+		throw new Error(response.data.error || 'Failed to upload images');
+	}
+	return response.data.results;
+};
+
 export const deletePicture = async (id: number) => {
 	if (pendingDeletes.has(id)) {
 		console.warn(`Delete request for picture ID ${id} is already in progress.`);
@@ -0,0 +1,14 @@
+import type { CSSProperties } from 'react';
+
+interface PicturePlaceholder {
+	dominant_color?: string;
+	placeholder?: string;
+}
+
+// Background shown while a picture loads: its tiny placeholder image,
+// stretched over the box, on top of its dominant colour
+export const placeholderStyle = (picture: PicturePlaceholder): CSSProperties => ({
+	backgroundColor: picture.dominant_color || undefined,
+	backgroundImage: picture.placeholder ? `url(${picture.placeholder})` : undefined,
+	backgroundSize: 'cover',
+});
@@ -3,9 +3,15 @@
 export interface Picture {
 	id: number;
 	image: string;
+	unique_id?: string;
 	thumb?: string;
 	gallery?: string;
 	portrait?: string;
+	variants_status?: 'pending' | 'ready' | 'failed';
+	width?: number | null;
+	height?: number | null;
+	dominant_color?: string;
+	placeholder?: string;
 }
 
 export interface Computer {
@@ -19,6 +25,42 @@ export interface Computer {
 	favorite?: string;
 }
 
+// Returned by the computers/sample/ endpoint
+export interface SampleComputer {
+	id: number;
+	name: string;
+	maker: string;
+	year?: number;
+	picture: {
+		image: string;
+		thumb?: string;
+		gallery?: string;
+		portrait?: string;
+	} | null;
+}
+
+// Filters of the computer list, see CollectionFilter on the backend
+export interface ComputerFilters {
+	year_min?: number;
+	year_max?: number;
+	maker?: string;
+	has_pictures?: boolean;
+}
+
+// Returned by the computers/stats/ endpoint
+export interface CollectionStats {
+	computers: number;
+	computers_with_pictures: number;
+	pictures: number;
+	makers: { maker: string; count: number }[];
+	without_maker: number;
+	years: { year: number; count: number }[];
+	decades: { decade: number; count: number }[];
+	without_year: number;
+}
+
+export type GameComputer = SampleComputer & { picture: NonNullable<SampleComputer['picture']> };
+
 export interface ComputerListProps {
 	computers: Computer[];
 	searchTerm: string;
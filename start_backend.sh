@@ -27,6 +27,11 @@ python manage.py migrate
 # Enable write mode (optional - comment out for read-only mode)
 export COMCOL_WRITE=1
 
+# Start the worker that generates picture variants after uploads
+python manage.py process_derivatives &
+WORKER_PID=$!
+trap "kill $WORKER_PID" EXIT
+
 # Start Django server
 echo "Starting Django backend at http://0.0.0.0:8000"
 echo "API will be available at http://localhost:8000/api/"